@@ -0,0 +1,60 @@
+import re
+import unicodedata
+from pathlib import Path
+from zipfile import ZipFile
+
+from tools.utils.linguistics import (
+    ADDITIONAL_STRESS_REPLACEMENTS,
+    is_russian_word,
+    ru_sorted_ignore_case,
+)
+from tools.utils.yoficator import Yoficator, deyoficate
+
+# Previous implementations, kept as the baselines of the benchmarks.
+
+STRESSES_REGEXP = re.compile(r"[\u0300\u0301]")
+
+
+def legacy_ru_sort_key_ignore_case(word: str) -> str:
+    def map_letter(ch: str) -> str:
+        if ch == "ё":
+            return "е1"
+        elif ch == "Ё":
+            return "Е1"
+        else:
+            return f"{ch}0"
+
+    return "".join(
+        [map_letter(ch) for ch in unicodedata.normalize("NFC", word.casefold())]
+    )
+
+
+def legacy_clear_word(word: str) -> list[str]:
+    cleaned_word = "".join(
+        ADDITIONAL_STRESS_REPLACEMENTS.get(ch, ch) for ch in word.replace("’", "'")
+    )
+    cleaned_word = STRESSES_REGEXP.sub("", cleaned_word)
+    subwords = [w.strip() for w in re.split(r"[,/]", cleaned_word) if w.strip()]
+    return [w for w in subwords if is_russian_word(w)]
+
+
+def legacy_from_ru_wiktionary(path: Path) -> Yoficator:
+    with ZipFile(path) as z:
+        lines = z.read("ru_wiktionary_word_forms.txt").decode("utf-8").split("\n")
+        words = set(w.strip() for w in lines if w.strip())
+
+    yofications: dict[str, list[str]] = {}
+    for w in words:
+        w_lower = w.lower()
+        if "е" in w_lower or "ё" in w_lower:
+            yofications.setdefault(deyoficate(w), []).append(w)
+
+    for ys in yofications.values():
+        ys_lower = [y.lower() for y in ys]
+        ys[:] = [
+            y
+            for y in ru_sorted_ignore_case(ys)
+            if y == y.lower() or y.lower() not in ys_lower
+        ]
+
+    return Yoficator(yofications=yofications)
@@ -0,0 +1,59 @@
+import functools
+import tempfile
+from pathlib import Path
+from typing import get_args
+
+import typer
+
+from tools.benchmarks.timing import best_time, timed
+from tools.utils.defines import ASSERT_LEXICON_ROOT
+from tools.utils.lexicon import (
+    LexiconCache,
+    LexiconLoader,
+    load_lexicon,
+    yaml_to_lexicon,
+)
+
+
+def main(lexicon_root: Path = ASSERT_LEXICON_ROOT, repeat: int = 3):
+    loaders: tuple[LexiconLoader, ...] = get_args(LexiconLoader)
+    print(f"{'lexicon':30}" + "".join(f"{loader:>12}" for loader in loaders))
+    totals: dict[LexiconLoader, float] = dict.fromkeys(loaders, 0.0)
+    for lexicon_path in sorted(lexicon_root.glob("*.yaml")):
+        content = lexicon_path.read_text(encoding="utf-8")
+        reference = yaml_to_lexicon(content, loader="pyyaml")
+        for loader in loaders:
+            assert yaml_to_lexicon(content, loader=loader) == reference, (
+                f"{lexicon_path.name}: {loader} loader result differs from pyyaml"
+            )
+        timings: dict[LexiconLoader, float] = {
+            loader: best_time(
+                functools.partial(yaml_to_lexicon, content, loader=loader), repeat
+            )
+            for loader in loaders
+        }
+        for loader, t in timings.items():
+            totals[loader] += t
+        print(
+            f"{lexicon_path.name:30}"
+            + "".join(f"{timings[loader] * 1000:10.1f}ms" for loader in loaders)
+        )
+    print(
+        f"{'total':30}"
+        + "".join(f"{totals[loader] * 1000:10.1f}ms" for loader in loaders)
+    )
+
+    lexicon_paths = sorted(lexicon_root.glob("*.yaml"))
+    timed(
+        "Header-only listing",
+        lambda: [load_lexicon(p, trusted=True, lazy=True) for p in lexicon_paths],
+    )
+
+    with tempfile.TemporaryDirectory() as cache_root:
+        cache = LexiconCache(Path(cache_root))
+        timed("Cold cache", lambda: [cache.load(p) for p in lexicon_paths])
+        timed("Warm cache", lambda: [cache.load(p) for p in lexicon_paths])
+
+
+if __name__ == "__main__":
+    typer.run(main)
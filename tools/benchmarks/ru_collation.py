@@ -0,0 +1,43 @@
+import random
+
+import typer
+
+from tools.benchmarks.legacy import legacy_ru_sort_key_ignore_case
+from tools.benchmarks.timing import timed
+from tools.utils.lexicon_corpus import LexiconCorpus
+from tools.utils.linguistics import (
+    ru_sort_key_ignore_case,
+    ru_sort_keys,
+    ru_sorted_ignore_case,
+)
+
+
+def main(num_words: int = 1_000_000, seed: int = 0):
+    vocabulary = sorted(LexiconCorpus.load(languages={"Russian"}).words("Russian"))
+    rng = random.Random(seed)
+    words = [
+        rng.choice(vocabulary) + rng.choice(["", "а", "ё", "Ё"])
+        for _ in range(num_words)
+    ]
+
+    _, legacy_keys_time = timed(
+        "legacy keys", lambda: [legacy_ru_sort_key_ignore_case(w) for w in words]
+    )
+    timed("per-word keys", lambda: [ru_sort_key_ignore_case(w) for w in words])
+    _, batch_keys_time = timed(
+        "batch keys", lambda: ru_sort_keys(words, ignore_case=True)
+    )
+    legacy_sorted, legacy_sort_time = timed(
+        "legacy sort", lambda: sorted(words, key=legacy_ru_sort_key_ignore_case)
+    )
+    timed("per-word key sort", lambda: sorted(words, key=ru_sort_key_ignore_case))
+    batch_sorted, batch_sort_time = timed(
+        "batch sort", lambda: ru_sorted_ignore_case(words)
+    )
+    assert batch_sorted == legacy_sorted
+    print(f"Key speedup: {legacy_keys_time / batch_keys_time:.1f}x")
+    print(f"Sort speedup: {legacy_sort_time / batch_sort_time:.1f}x")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,47 @@
+import time
+import tracemalloc
+from collections.abc import Callable
+
+
+# Best time of `repeat` runs of `f`.
+def best_time(f: Callable[[], object], repeat: int = 1) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Peak memory allocated while running `f`, in MiB.
+def peak_memory(f: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        f()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+# Runs `f` once, prints its time and returns its result and time.
+def timed[T](description: str, f: Callable[[], T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = f()
+    duration = time.perf_counter() - start
+    print(f"{description:40}{duration * 1000:10.1f}ms")
+    return result, duration
+
+
+# Runs `f` once, prints its time and peak memory and returns its result.
+def measured[T](description: str, f: Callable[[], T]) -> T:
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = f()
+        duration = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    print(f"{description:40}{duration * 1000:10.1f}ms{peak / 2**20:10.1f}MiB peak")
+    return result
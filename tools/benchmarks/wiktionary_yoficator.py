@@ -0,0 +1,34 @@
+from pathlib import Path
+from zipfile import ZipFile
+
+import typer
+
+from tools.benchmarks.legacy import legacy_from_ru_wiktionary
+from tools.benchmarks.timing import measured
+from tools.utils.defines import RU_WIKTIONARY_WORD_FORMS_ZIP
+from tools.utils.yoficator import Yoficator
+
+
+def main(path: Path = RU_WIKTIONARY_WORD_FORMS_ZIP):
+    print(f"Zip size: {path.stat().st_size / 2**20:.1f}MiB")
+    with ZipFile(path) as z:
+        print(
+            "Uncompressed size: "
+            f"{z.getinfo('ru_wiktionary_word_forms.txt').file_size / 2**20:.1f}MiB"
+        )
+
+    legacy = measured("legacy", lambda: legacy_from_ru_wiktionary(path))
+    streaming = measured("streaming", lambda: Yoficator.from_ru_wiktionary(path))
+    measured(
+        "streaming, compact",
+        lambda: Yoficator.from_ru_wiktionary(path, storage="compact"),
+    )
+
+    # Only lowercase words are looked up: results for them must not change.
+    for key, ys in legacy.yofications.items():
+        if key == key.lower():
+            assert streaming.yofications[key] == ys, key
+
+
+if __name__ == "__main__":
+    typer.run(main)
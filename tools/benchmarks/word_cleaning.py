@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import Annotated
+
+import typer
+from tqdm import tqdm
+
+from tools.benchmarks.legacy import legacy_clear_word
+from tools.benchmarks.timing import timed
+from tools.lexicon_py.wiktextract_extra_ru_models import parse_entry
+from tools.lexicon_py.wiktextract_ru_models import WordEntry
+from tools.utils.linguistics import clean_russian_words
+
+
+def main(
+    raw_wiktextract_data_path: Annotated[
+        Path,
+        typer.Argument(
+            ..., help="Path to raw-wiktextract-data.jsonl from https://kaikki.org/"
+        ),
+    ],
+):
+    entries: list[list[str]] = []
+    with open(raw_wiktextract_data_path, encoding="utf-8") as f:
+        for line in tqdm(f, desc="Parsing entries"):
+            entry = parse_entry(line)
+            if isinstance(entry, WordEntry) and entry.lang_code == "ru":
+                entries.append([entry.word, *(form.form for form in entry.forms)])
+    words = [w for entry_words in entries for w in entry_words]
+    print(f"{len(words)} words in {len(entries)} entries")
+
+    legacy_words, legacy_time = timed(
+        "legacy per-word chain",
+        lambda: [w for word in words for w in legacy_clear_word(word)],
+    )
+    per_entry_words, _ = timed(
+        "batch per entry",
+        lambda: [
+            w for entry_words in entries for w in clean_russian_words(entry_words).words
+        ],
+    )
+    batch_result, batch_time = timed(
+        "batch whole dump", lambda: clean_russian_words(words)
+    )
+    assert per_entry_words == legacy_words
+    assert batch_result.words == legacy_words
+    print(dict(batch_result.counts.most_common()))
+    print(f"Speedup: {legacy_time / batch_time:.1f}x")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,227 @@
+import cProfile
+import functools
+import json
+import platform
+import pstats
+import random
+import subprocess
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from tools.benchmarks.timing import best_time, peak_memory
+from tools.utils.defines import (
+    ASSERT_LEXICON_ROOT,
+    CACHE_ROOT,
+    E2YO_KERNEL_NOT_SAFE_TXT,
+    E2YO_KERNEL_SAFE_TXT,
+    RU_WIKTIONARY_WORD_FORMS_ZIP,
+    YOFICATION_DICTIONARY_YAML,
+)
+from tools.utils.lexicon import LexiconCache
+from tools.utils.lexicon_corpus import LexiconCorpus
+from tools.utils.linguistics import is_relaxed_russian_word
+from tools.utils.yoficator import YoficationStorage, Yoficator
+
+BASELINE_JSON = CACHE_ROOT / "benchmarks" / "yoficator_lookups.json"
+
+
+@dataclass
+class YoficatorBenchmark:
+    construction_ms: float
+    peak_mib: float
+    entries: int
+    # Nanoseconds per `Yoficator.__call__`.
+    hit_ns: float
+    miss_ns: float
+    ambiguous_ns: float
+    bulk_words_per_s: float
+
+
+# Constructor name, its sources and a function building it with a storage.
+CONSTRUCTORS: list[tuple[str, list[Path], Callable[[YoficationStorage], Yoficator]]] = [
+    (
+        "e2yo_kernel",
+        [E2YO_KERNEL_SAFE_TXT, E2YO_KERNEL_NOT_SAFE_TXT],
+        lambda storage: Yoficator.from_e2yo_kernel(storage=storage),
+    ),
+    (
+        "yofication_dictionary",
+        [YOFICATION_DICTIONARY_YAML],
+        lambda storage: Yoficator.from_yofication_dictionary(storage=storage),
+    ),
+    (
+        "ru_wiktionary",
+        [RU_WIKTIONARY_WORD_FORMS_ZIP],
+        lambda storage: Yoficator.from_ru_wiktionary(storage=storage),
+    ),
+]
+STORAGES: dict[str, list[YoficationStorage]] = {
+    "e2yo_kernel": ["dict", "compact", "snapshot", "kernel"],
+    "yofication_dictionary": ["dict", "compact", "snapshot"],
+    "ru_wiktionary": ["dict", "compact", "snapshot"],
+}
+
+
+def git_commit() -> str:
+    try:
+        return (
+            subprocess.check_output(["git", "rev-parse", "--short", "HEAD"])
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def lookup_ns(yoficator: Yoficator, words: list[str], repeat: int) -> float:
+    if not words:
+        return float("nan")
+
+    def lookup_all():
+        for w in words:
+            yoficator(w)
+
+    return best_time(lookup_all, repeat) / len(words) * 1e9
+
+
+# Hits, misses and ambiguous words, `sample_size` of each at most.
+def lookup_samples(
+    yoficator: Yoficator, sample_size: int
+) -> tuple[list[str], list[str], list[str]]:
+    rng = random.Random(0)
+    keys = [k for k in yoficator.yofications if k == k.lower()]
+    hits = rng.sample(keys, min(sample_size, len(keys)))
+    misses = [f"{k}ъъ" for k in hits if f"{k}ъъ" not in yoficator.yofications]
+    ambiguous_keys = [k for k in keys if len(yoficator.yofications[k]) > 1]
+    ambiguous = rng.sample(ambiguous_keys, min(sample_size, len(ambiguous_keys)))
+    return hits, misses, ambiguous
+
+
+def benchmark(
+    build: Callable[[], Yoficator],
+    lexicon_words: list[str],
+    *,
+    repeat: int,
+    sample_size: int,
+) -> YoficatorBenchmark:
+    construction_time = best_time(build, repeat=1)
+    peak_mib = peak_memory(build)
+    yoficator = build()
+    hits, misses, ambiguous = lookup_samples(yoficator, sample_size)
+
+    def bulk():
+        for w in lexicon_words:
+            yoficator(w)
+
+    return YoficatorBenchmark(
+        construction_ms=construction_time * 1000,
+        peak_mib=peak_mib,
+        entries=len(yoficator.yofications),
+        hit_ns=lookup_ns(yoficator, hits, repeat),
+        miss_ns=lookup_ns(yoficator, misses, repeat),
+        ambiguous_ns=lookup_ns(yoficator, ambiguous, repeat),
+        bulk_words_per_s=len(lexicon_words) / best_time(bulk, repeat),
+    )
+
+
+def print_results(
+    results: dict[str, YoficatorBenchmark],
+    baseline: dict[str, dict[str, float]],
+):
+    fields = list(YoficatorBenchmark.__dataclass_fields__)
+    print(f"{'':36}" + "".join(f"{field:>18}" for field in fields))
+    for name, result in results.items():
+        values = asdict(result)
+        print(f"{name:36}" + "".join(f"{values[f]:18.1f}" for f in fields))
+        if name in baseline:
+            ratios = [
+                values[f] / baseline[name][f] if baseline[name].get(f) else None
+                for f in fields
+            ]
+            print(
+                f"{'  vs baseline':36}"
+                + "".join(
+                    f"{r:17.2f}x" if r is not None else f"{'-':>18}" for r in ratios
+                )
+            )
+
+
+def main(
+    output: Annotated[
+        Path,
+        typer.Option(
+            help="JSON file for the results; the results already in it are shown "
+            "as the baseline"
+        ),
+    ] = BASELINE_JSON,
+    repeat: int = 3,
+    sample_size: int = 10000,
+    profile: Annotated[
+        bool, typer.Option(help="Profile bulk lookups of each constructor and storage")
+    ] = False,
+):
+    lexicon_words = sorted(
+        w
+        for w in LexiconCorpus.load(
+            ASSERT_LEXICON_ROOT, languages={"Russian"}, cache=LexiconCache()
+        ).words("Russian")
+        if is_relaxed_russian_word(w)
+    )
+    print(f"{len(lexicon_words)} lexicon words")
+
+    results: dict[str, YoficatorBenchmark] = {}
+    for constructor, sources, build in CONSTRUCTORS:
+        missing = [source for source in sources if not source.exists()]
+        if missing:
+            print(f"Skipping {constructor}: {', '.join(map(str, missing))} missing")
+            continue
+        for storage in STORAGES[constructor]:
+            name = f"{constructor}/{storage}"
+            if storage == "snapshot":
+                # Measure loading a snapshot, not building it.
+                build(storage)
+            results[name] = benchmark(
+                functools.partial(build, storage),
+                lexicon_words,
+                repeat=repeat,
+                sample_size=sample_size,
+            )
+            if profile:
+                yoficator = build(storage)
+                profiler = cProfile.Profile()
+                profiler.enable()
+                for w in lexicon_words:
+                    yoficator(w)
+                profiler.disable()
+                print(f"Bulk lookups of {name}:")
+                pstats.Stats(profiler).sort_stats("tottime").print_stats(8)
+
+    baseline: dict[str, dict[str, float]] = {}
+    if output.exists():
+        previous = json.loads(output.read_text(encoding="utf-8"))
+        print(f"Baseline: commit {previous['commit']}")
+        baseline = previous["results"]
+    print_results(results, baseline)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "results": {name: asdict(r) for name, r in results.items()},
+            },
+            indent=2,
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
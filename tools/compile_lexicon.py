@@ -0,0 +1,14 @@
+from pathlib import Path
+
+import typer
+
+from tools.utils.lexicon import compile_lexicon, yaml_to_lexicon
+
+
+def main(lexicon_path: Path, compiled_lexicon_path: Path):
+    lexicon = yaml_to_lexicon(lexicon_path.read_text(encoding="utf-8"))
+    compile_lexicon(lexicon, compiled_lexicon_path)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,5 +1,10 @@
+import functools
+import glob
+import sys
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Annotated
 
 import typer
 
@@ -8,8 +13,8 @@ from tools.utils.linguistics import ru_sort_key_ignore_case
 from tools.utils.sort import sorted_unique
 
 
-def format_lexicon(lexicon_path: Path):
-    lexicon = yaml_to_lexicon(lexicon_path.read_text(encoding="utf-8"))
+def format_lexicon_yaml(content: str) -> str:
+    lexicon = yaml_to_lexicon(content)
 
     sort_key: Callable[[str], str]
     match lexicon.language:
@@ -31,8 +36,66 @@ def format_lexicon(lexicon_path: Path):
         case _:
             raise ValueError(f"Unknown lexicon kind: {lexicon.kind}")
 
-    lexicon_path.write_text(lexicon_to_yaml(lexicon), encoding="utf-8")
+    return lexicon_to_yaml(lexicon)
+
+
+# Returns True if the file was not formatted. The file is only rewritten if
+# `check` is False and the content actually changes.
+def format_lexicon(lexicon_path: Path, *, check: bool = False) -> bool:
+    content = lexicon_path.read_text(encoding="utf-8")
+    formatted_content = format_lexicon_yaml(content)
+    if formatted_content == content:
+        return False
+    if not check:
+        lexicon_path.write_text(formatted_content, encoding="utf-8")
+    return True
+
+
+# Directories and globs that match no lexicons are errors: otherwise a typo
+# would make `--check` pass without checking anything.
+def expand_lexicon_paths(paths: list[Path]) -> list[Path]:
+    lexicon_paths: list[Path] = []
+    for path in paths:
+        if path.is_dir():
+            matches = sorted(path.glob("*.yaml"))
+        elif not path.exists() and any(ch in str(path) for ch in "*?["):
+            matches = sorted(map(Path, glob.glob(str(path))))
+        else:
+            lexicon_paths.append(path)
+            continue
+        if not matches:
+            raise FileNotFoundError(f"No lexicons match {path}")
+        lexicon_paths.extend(matches)
+    return list(dict.fromkeys(lexicon_paths))
+
+
+def main(
+    paths: Annotated[
+        list[Path], typer.Argument(help="Lexicon files, directories or globs")
+    ],
+    check: Annotated[
+        bool, typer.Option(help="Report unformatted files without changing them")
+    ] = False,
+    jobs: Annotated[int | None, typer.Option(help="Number of worker processes")] = None,
+):
+    lexicon_paths = expand_lexicon_paths(paths)
+    # Start with the largest files to keep all workers busy until the end.
+    by_size = sorted(lexicon_paths, key=lambda p: p.stat().st_size, reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        unformatted_by_path = dict(
+            zip(
+                by_size,
+                executor.map(functools.partial(format_lexicon, check=check), by_size),
+                strict=True,
+            )
+        )
+    unformatted = [unformatted_by_path[p] for p in lexicon_paths]
+    for lexicon_path, is_unformatted in zip(lexicon_paths, unformatted, strict=True):
+        if is_unformatted:
+            print(f"{'Would reformat' if check else 'Reformatted'} {lexicon_path}")
+    if check and any(unformatted):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
-    typer.run(format_lexicon)
+    typer.run(main)
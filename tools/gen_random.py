@@ -1,10 +1,13 @@
 import argparse
 import random
 import sys
+from collections.abc import Sequence
 from pathlib import Path
 
 import yaml
 
+from tools.utils.lexicon import COMPILED_LEXICON_SUFFIX, open_compiled_lexicon
+
 parser = argparse.ArgumentParser(
     description="Generates random works for a tournament that were not used earlier"
 )
@@ -13,10 +16,13 @@ parser.add_argument("n", type=int, help="Number of words to generate")
 parser.add_argument("--denylist", nargs="*", type=Path, help="Denylist")
 
 
-def parse_source_dict(path: Path) -> set[str]:
+def parse_source_dict(path: Path) -> Sequence[str]:
+    if path.suffix == COMPILED_LEXICON_SUFFIX:
+        # Words are read from the memory-mapped file on demand.
+        return open_compiled_lexicon(path).words
     with open(path, encoding="utf-8") as f:
         doc = list(yaml.safe_load_all(f))
-        return set(doc[1])
+        return list(dict.fromkeys(doc[1]))
 
 
 def parse_denylist(path: Path) -> set[str]:
@@ -38,9 +44,15 @@ def main():
 
     source_dict = parse_source_dict(args.source_dict)
     denylist = parse_denylists(args)
-    allowed_words = source_dict - denylist
-    print(f"Allowed words: {len(allowed_words)} of {len(source_dict)}", file=sys.stderr)
-    print("\n".join(random.sample(list(allowed_words), args.n)))
+    allowed_indices: Sequence[int] = (
+        [i for i, w in enumerate(source_dict) if w not in denylist]
+        if denylist
+        else range(len(source_dict))
+    )
+    print(
+        f"Allowed words: {len(allowed_indices)} of {len(source_dict)}", file=sys.stderr
+    )
+    print("\n".join(source_dict[i] for i in random.sample(allowed_indices, args.n)))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
+import itertools
 import json
-import re
 from collections import defaultdict
 from collections.abc import Iterable
 from pathlib import Path
@@ -12,36 +12,26 @@ from tools.lexicon_py.wiktextract_extra_ru_models import TitleEntry, parse_entry
 from tools.lexicon_py.wiktextract_ru_models import WordEntry
 from tools.utils.defines import WAREHOUSE_LEXICON_ROOT
 from tools.utils.linguistics import (
-    is_russian_word,
+    clean_russian_words,
     remove_stresses,
-    ru_sorted_with_case,
+    ru_sort_key_with_case,
 )
+from tools.utils.sort import iter_sorted_unique
 
 OUTPUT_ROOT = WAREHOUSE_LEXICON_ROOT / "ru" / "wikiextract"
 
 
-def clear_word(word: str, stats: defaultdict[str, int], key: str) -> list[str]:
-    stats[f"{key}_total"] += 1
-
-    cleaned_word = remove_stresses(word.replace("’", "'"))
-    if cleaned_word != word:
-        stats[f"{key}_stresses"] += 1
-
-    subwords = [w.strip() for w in re.split(r"[,/]", cleaned_word) if w.strip()]
-
-    russian_subwords = [w for w in subwords if is_russian_word(w)]
-    if len(russian_subwords) != len(subwords):
-        stats[f"{key}_skipped"] += 1
-    if len(russian_subwords) > 1:
-        stats[f"{key}_compound"] += 1
-
-    return russian_subwords
+def clear_words(words: list[str], stats: dict[str, int], key: str) -> list[str]:
+    result = clean_russian_words(words)
+    for name, count in result.counts.items():
+        stats[f"{key}_{name}"] += count
+    return result.words
 
 
 def dump_dict(words: Iterable[str], name: str):
-    (OUTPUT_ROOT / f"{name}.txt").write_text(
-        "\n".join(ru_sorted_with_case(words)), encoding="utf-8"
-    )
+    with open(OUTPUT_ROOT / f"{name}.txt", "w", encoding="utf-8") as f:
+        for i, word in enumerate(iter_sorted_unique(words, key=ru_sort_key_with_case)):
+            f.write(f"\n{word}" if i > 0 else word)
 
 
 def main(
@@ -66,15 +56,24 @@ def main(
             entry = parse_entry(line)
             if isinstance(entry, WordEntry):
                 if entry.lang_code == "ru":
-                    for form in entry.forms:
-                        forms.update(clear_word(form.form, stats, "forms"))
-                    words.update(clear_word(entry.word, stats, "words"))
+                    forms.update(
+                        clear_words([form.form for form in entry.forms], stats, "forms")
+                    )
+                    words.update(clear_words([entry.word], stats, "words"))
             elif isinstance(entry, TitleEntry):
                 title_entries.append(entry)
 
-    for entry in title_entries:
-        if remove_stresses(entry.redirect) in words:  # check if Russian word
-            titles.update(clear_word(entry.title, stats, "titles"))
+    titles.update(
+        clear_words(
+            [
+                entry.title
+                for entry in title_entries
+                if remove_stresses(entry.redirect) in words  # check if Russian word
+            ],
+            stats,
+            "titles",
+        )
+    )
 
     stats = dict(sorted(stats.items()))
     print(json.dumps(stats, indent=2))
@@ -95,7 +94,7 @@ def main(
         dump_dict(titles_minus_forms_ignore_case, "titles_minus_forms_ignore_case")
         dump_dict(words_minus_forms_ignore_case, "words_minus_forms_ignore_case")
 
-    dump_dict(words | forms | titles, "all")
+    dump_dict(itertools.chain(words, forms, titles), "all")
 
 
 if __name__ == "__main__":
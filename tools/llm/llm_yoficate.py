@@ -1,41 +1,24 @@
 import asyncio
+import contextlib
 from pathlib import Path
+from typing import Annotated
 
 import litellm
 import typer
-import yaml
 from pydantic import BaseModel
 from rich.console import Console
 
+from tools.utils.journal import ResultJournal, journal_path
 from tools.utils.lexicon import yaml_to_lexicon
 from tools.utils.linguistics import is_russian_word
-from tools.utils.llm import ReasoningEffort, simple_llm_request
+from tools.utils.llm import (
+    MAX_LLM_CONCURRENCY,
+    LlmCache,
+    ReasoningEffort,
+    simple_llm_request,
+)
 from tools.utils.parallel_process import parallel_process
-from tools.utils.yaml import FlowListDumper
-
-
-class YoficationDictionary(BaseModel):
-    yofications: dict[str, list[str]]
-
-    @classmethod
-    def from_yaml(cls, content: str) -> "YoficationDictionary":
-        yofications: dict[str, list[str]] = yaml.safe_load(content)
-        yofications = {
-            k: [k if v == "=" else v for v in vs] for k, vs in yofications.items()
-        }
-        return cls(yofications=yofications)
-
-    def to_yaml(self) -> str:
-        yofications = {
-            k: sorted(["=" if v == k else v for v in vs])
-            for k, vs in self.yofications.items()
-        }
-        return yaml.dump(
-            yofications,
-            allow_unicode=True,
-            Dumper=FlowListDumper,
-            default_flow_style=False,
-        )
+from tools.utils.yoficator import Yoficator
 
 
 class YoficateResult(BaseModel):
@@ -121,7 +104,7 @@ def is_yofication(yo_word: str, e_word: str) -> bool:
     return yo_word.lower().replace("ё", "е") == e_word.lower()
 
 
-async def yoficate(word: str) -> YoficateResult:
+async def yoficate(word: str, cache: LlmCache | None) -> YoficateResult:
     assert is_russian_word(word)
     responses = [
         await simple_llm_request(
@@ -129,6 +112,7 @@ async def yoficate(word: str) -> YoficateResult:
             reasoning_effort=REASONING_EFFORT,
             system_message=REQUEST,
             user_message=word,
+            cache=cache,
         )
         for model in MODELS
     ]
@@ -151,7 +135,10 @@ async def yoficate(word: str) -> YoficateResult:
 
 
 async def generate_yofication_dictionary(
-    *, source_lexicon_path: Path, yofication_dictionary_path: Path
+    *,
+    source_lexicon_path: Path,
+    yofication_dictionary_path: Path,
+    cache: LlmCache | None,
 ):
     source_lexicon = yaml_to_lexicon(source_lexicon_path.read_text(encoding="utf-8"))
     assert source_lexicon.language == "Russian"
@@ -168,59 +155,76 @@ async def generate_yofication_dictionary(
     source_words = set(w.replace("ё", "е").replace("Ё", "Е") for w in source_words)
     source_words = set(w for w in source_words if "е" in w or "Е" in w)
 
+    yofications: dict[str, list[str]] = {}
     if yofication_dictionary_path.exists():
-        yofication_dictionary = YoficationDictionary.from_yaml(
-            yofication_dictionary_path.read_text(encoding="utf-8")
+        yofications.update(
+            Yoficator.from_yofication_dictionary(
+                yofication_dictionary_path
+            ).yofications
         )
-        for word, yoficated_words in yofication_dictionary.yofications.items():
+        for word, yoficated_words in yofications.items():
             assert all(
                 is_yofication(w, word) for w in yoficated_words
             ), f"{word} => {yoficated_words}"
-    else:
-        yofication_dictionary = YoficationDictionary(yofications={})
 
-    words_to_process = list(
-        source_words - set(yofication_dictionary.yofications.keys())
-    )
+    def apply(r: YoficateResult):
+        yofications[r.word] = r.yoficated_words
 
-    if len(words_to_process) == 0:
-        console.print("No words to process")
-        return
+    def save():
+        Yoficator(yofications=yofications).save_to_yofication_dictionary(
+            yofication_dictionary_path
+        )
 
-    results = await parallel_process(
-        words_to_process,
-        yoficate,
-        console=console,
-        progress_description="Generating yofications",
-    )
+    # Results are journaled as they arrive and the dictionary is saved every
+    # few seconds, so an interrupted run loses almost nothing.
+    with ResultJournal(
+        journal_path(yofication_dictionary_path), YoficateResult, apply=apply, save=save
+    ) as journal:
+        if replayed := journal.replay():
+            console.print(f"Recovered {replayed} words from {journal.path}")
+
+        words_to_process = list(source_words - set(yofications.keys()))
+
+        if len(words_to_process) == 0:
+            console.print("No words to process")
+            return
+
+        results = await parallel_process(
+            words_to_process,
+            lambda word: yoficate(word, cache),
+            console=console,
+            progress_description="Generating yofications",
+            # Requests in flight are limited per model.
+            max_parallel_requests=MAX_LLM_CONCURRENCY,
+            on_success=journal.append,
+        )
 
     total_cost = 0
     for result in results:
         if result.status == "success":
-            r = result.value
-            yofication_dictionary.yofications[r.word] = r.yoficated_words
-            total_cost += r.cost_usd
-
-    yofication_dictionary.yofications = {
-        k: vs for k, vs in sorted(yofication_dictionary.yofications.items())
-    }
-    yofication_dictionary_path.write_text(
-        yofication_dictionary.to_yaml(), encoding="utf-8"
-    )
+            total_cost += result.value.cost_usd
+
     console.print(f"Saved to {yofication_dictionary_path}")
     console.print(f"Total cost: {total_cost:.2f}$")
+    if cache is not None:
+        console.print(f"Cache: {cache.stats}")
 
 
 def main(
     source_lexicon_path: Path,
     yofication_dictionary_path: Path,
+    cache: Annotated[
+        bool, typer.Option(help="Reuse responses to identical earlier requests")
+    ] = False,
 ):
-    asyncio.run(
-        generate_yofication_dictionary(
-            source_lexicon_path=source_lexicon_path,
-            yofication_dictionary_path=yofication_dictionary_path,
+    with LlmCache() if cache else contextlib.nullcontext() as llm_cache:
+        asyncio.run(
+            generate_yofication_dictionary(
+                source_lexicon_path=source_lexicon_path,
+                yofication_dictionary_path=yofication_dictionary_path,
+                cache=llm_cache,
+            )
         )
-    )
 
 
 if __name__ == "__main__":
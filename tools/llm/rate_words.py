@@ -1,16 +1,18 @@
 import argparse
+import asyncio
 from pathlib import Path
 from typing import Literal
 
 import pandas as pd
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
 from termcolor import colored
-from tqdm import tqdm
 
 from tools.llm.common import not_none
+from tools.utils.parallel_process import ProcessingSuccess, parallel_process_stream
 
 MODEL = "gpt-4o-mini"
+MAX_PARALLEL_REQUESTS = 16
 
 SYSTEM_MESSAGE = """
 You provide information about the Russian word given to you.
@@ -24,7 +26,7 @@ parser.add_argument(
 args = parser.parse_args()
 words_df_path = Path(args.words)
 
-client = OpenAI()
+client = AsyncOpenAI()
 
 
 # TODO: Add `ge=0, le=10` when ChatGPT supports it.
@@ -93,8 +95,8 @@ class ModelRefusal(ValueError):
     pass
 
 
-def gen_word_ratings(word) -> WordRatings:
-    response = client.beta.chat.completions.parse(
+async def gen_word_ratings(word) -> WordRatings:
+    response = await client.beta.chat.completions.parse(
         model=MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_MESSAGE},
@@ -110,20 +112,27 @@ def gen_word_ratings(word) -> WordRatings:
     return not_none(response_message.parsed)
 
 
+async def rate_word(word: str) -> WordRatings | ModelRefusal:
+    try:
+        return await gen_word_ratings(word)
+    except ModelRefusal as e:
+        return e
+
+
 def ensure_columns(df: pd.DataFrame, columns: list[str]) -> None:
     for col in columns:
         if col not in df.columns:
             df[col] = pd.NA
 
 
-def inspect(words: list[str]) -> None:
+async def inspect(words: list[str]) -> None:
     for word in words:
         print(f"{colored(word, 'white')}:")
-        for key, value in gen_word_ratings(word).model_dump().items():
+        for key, value in (await gen_word_ratings(word)).model_dump().items():
             print(f"  {key}: {value}")
 
 
-# inspect(["яблоко", "комсомолец", "комсомолка", "вуз", "комп", "сейв", "ярмо", "диакон", "дьякон", "рим", "москва", "десятый"])
+# asyncio.run(inspect(["яблоко", "комсомолец", "комсомолка", "вуз", "комп", "сейв", "ярмо", "диакон", "дьякон", "рим", "москва", "десятый"]))
 # exit(0)
 
 
@@ -138,20 +147,35 @@ total_rows = len(df)
 rows_to_process = list(df.loc[df["confidence"].isna() & df["refusal"].isna()].index)
 num_processed = 0
 num_refused = 0
+num_failed = 0
 num_skipped = total_rows - len(rows_to_process)
 
-try:
-    pbar = tqdm(rows_to_process)
-    for word in pbar:
-        pbar.set_description(f"{word:20}")
-        assert isinstance(word, str)
-        try:
-            for key, value in gen_word_ratings(word).model_dump().items():
-                df.at[word, key] = value
-        except ModelRefusal as e:
-            df.at[word, "refusal"] = str(e)
+
+# Ratings are stored as they arrive, so an interrupted run keeps them. Failed
+# words are left unrated for the next run.
+async def rate_words(words: list[str]):
+    global num_processed, num_refused, num_failed
+    async for index, result in parallel_process_stream(
+        words,
+        rate_word,
+        progress_description="Rating words",
+        workers=MAX_PARALLEL_REQUESTS,
+    ):
+        word = words[index]
+        if not isinstance(result, ProcessingSuccess):
+            num_failed += 1
+        elif isinstance(result.value, ModelRefusal):
+            df.at[word, "refusal"] = str(result.value)
             num_refused += 1
-        num_processed += 1
+            num_processed += 1
+        else:
+            for key, value in result.value.model_dump().items():
+                df.at[word, key] = value
+            num_processed += 1
+
+
+try:
+    asyncio.run(rate_words(rows_to_process))
 except KeyboardInterrupt:
     print("Bye!")
 
@@ -159,6 +183,7 @@ PAD = 5
 print(f"{num_skipped:{PAD}} words skipped")
 print(f"{num_processed:{PAD}} words processed successfully")
 print(f"{num_refused:{PAD}} words refused by the model")
+print(f"{num_failed:{PAD}} words failed")
 
 df.to_pickle(words_df_path)
 print(f"Data saved to {words_df_path}")
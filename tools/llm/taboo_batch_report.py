@@ -0,0 +1,78 @@
+import asyncio
+import random
+import time
+from pathlib import Path
+from typing import Annotated
+
+import typer
+
+from tools.llm.taboo_words import MODEL, console, gen_forbidden_words
+from tools.utils.lexicon import yaml_to_lexicon
+
+
+# Generates forbidden words for the same sample of words with each batch size
+# and compares the costs per 1000 words. Responses are not cached, so every
+# run pays for all requests.
+async def compare_batch_sizes(
+    *, source_lexicon_path: Path, sample_size: int, batch_sizes: list[int]
+):
+    source_lexicon = yaml_to_lexicon(source_lexicon_path.read_text(encoding="utf-8"))
+    assert source_lexicon.kind == "standard"
+    words = random.Random(0).sample(
+        source_lexicon.words, min(sample_size, len(source_lexicon.words))
+    )
+    console.print(f"{len(words)} words from {source_lexicon_path.name}, {MODEL}")
+
+    rows: list[tuple[int, float, float, float, float, int, int]] = []
+    for batch_size in batch_sizes:
+        start = time.monotonic()
+        generated = await gen_forbidden_words(
+            language=source_lexicon.language,
+            words=words,
+            batch_size=batch_size,
+            cache=None,
+        )
+        duration = time.monotonic() - start
+        per_1000 = 1000 / len(words)
+        rows.append(
+            (
+                batch_size,
+                generated.cost_usd * per_1000,
+                generated.prompt_tokens * per_1000,
+                generated.completion_tokens * per_1000,
+                duration * per_1000,
+                generated.requests,
+                len(generated.failed_words),
+            )
+        )
+
+    console.print(
+        f"{'batch size':>10}{'cost, $':>12}{'prompt tokens':>16}"
+        f"{'output tokens':>16}{'time, s':>12}{'requests':>10}{'failed':>8}"
+    )
+    console.print(f"{'':10}{'(per 1000 words)':^56}")
+    for batch_size, cost, prompt, completion, duration, requests, failed in rows:
+        console.print(
+            f"{batch_size:10}{cost:12.2f}{prompt:16.0f}{completion:16.0f}"
+            f"{duration:12.1f}{requests:10}{failed:8}"
+        )
+
+
+def main(
+    source_lexicon_path: Path,
+    sample_size: int = 100,
+    batch_sizes: Annotated[
+        list[int] | None, typer.Option("--batch-size", help="Can be repeated")
+    ] = None,
+):
+    asyncio.run(
+        compare_batch_sizes(
+            source_lexicon_path=source_lexicon_path,
+            sample_size=sample_size,
+            batch_sizes=batch_sizes or [1, 5, 10, 20, 50],
+        )
+    )
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,14 +1,26 @@
 import asyncio
+import contextlib
 import datetime
+import re
+from collections.abc import Callable
 from pathlib import Path
+from typing import Annotated
 
 import litellm
 import typer
 from pydantic import BaseModel
 from rich.console import Console
 
-from tools.utils.lexicon import TabooLexicon, lexicon_to_yaml, yaml_to_lexicon
-from tools.utils.llm import ReasoningEffort, simple_llm_request
+from tools.utils.files import write_atomically
+from tools.utils.journal import ResultJournal, journal_path
+from tools.utils.lexicon import TabooLexicon, write_lexicon_yaml, yaml_to_lexicon
+from tools.utils.llm import (
+    MAX_LLM_CONCURRENCY,
+    LlmCache,
+    ReasoningEffort,
+    SimpleLlmResponse,
+    simple_llm_request,
+)
 from tools.utils.parallel_process import parallel_process
 
 
@@ -21,10 +33,12 @@ class ForbiddenWordsResult(BaseModel):
 MODEL = "gemini/gemini-2.5-pro"
 # MODEL = "anthropic/claude-opus-4-1"
 REASONING_EFFORT: ReasoningEffort = "low"
+BATCH_HEADER_PREFIX = "## "
+# A single word: letters, possibly joined by hyphens or apostrophes.
+FORBIDDEN_WORD_REGEXP = re.compile(r"[^\W\d_]+(?:[-'’][^\W\d_]+)*")
 
-REQUEST = """
-Generate 10 forbidden words for a Taboo-like game in {language}.
-
+# Guidelines shared by the single-word and the batch requests.
+GUIDELINES = """
 Good forbidden words make the target word hard to explain and include:
 - Synonyms, antonyms and related words: parts, categories, descriptions, etc.
 - Words commonly used together with the target word: idioms, quotes, names, movie titles, etc.
@@ -36,36 +50,179 @@ Requirements:
 - Never include cognates of the target word or other forbidden words.
 - Match gender/number agreement for adjectives when relevant.
 - All words must be in lowercase, unless the word is a proper noun and is always capitalized.
+""".strip()
+
+REQUEST = f"""
+Generate 10 forbidden words for a Taboo-like game in {{language}}.
+
+{GUIDELINES}
 - Output one word per line.
 - Do not include any other text. NO bullets, NO numbering, NO comments, NO headers, NO nothing.
 """.strip()
 
+BATCH_REQUEST = f"""
+Generate 10 forbidden words for a Taboo-like game in {{language}} for each target word. The target words are given one per line.
+
+{GUIDELINES}
+- For each target word, in the order given, output a line "{BATCH_HEADER_PREFIX}<target word>", then its forbidden words, one per line.
+- Do not include any other text. NO bullets, NO numbering, NO comments, NO nothing.
+""".strip()
+
 litellm.suppress_debug_info = True
 
 console = Console(highlight=False)
 
 
-async def gen_forbidden_words(
+class ForbiddenWordsBatch(BaseModel):
+    results: list[ForbiddenWordsResult] = []
+    # Words without a usable answer after all attempts.
+    failed_words: list[str] = []
+    requests: int = 0
+    cost_usd: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, other: "ForbiddenWordsBatch"):
+        self.results += other.results
+        self.failed_words += other.failed_words
+        self.requests += other.requests
+        self.cost_usd += other.cost_usd
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+
+
+# Forbidden words from the lines of a response. Other lines, such as code
+# fences, are dropped.
+def parse_forbidden_words(lines: list[str]) -> list[str]:
+    return [w for line in lines if FORBIDDEN_WORD_REGEXP.fullmatch(w := line.strip())]
+
+
+# Splits a batch response into forbidden words per target word. Target words
+# that are missing, repeated or have no forbidden words are left out.
+def parse_batch_response(text: str, words: list[str]) -> dict[str, list[str]]:
+    sections: dict[str, list[str]] = {}
+    repeated: set[str] = set()
+    section: list[str] | None = None
+    for line in text.split("\n"):
+        line = line.strip()
+        if line.startswith(BATCH_HEADER_PREFIX):
+            word = line.removeprefix(BATCH_HEADER_PREFIX).strip()
+            if word in sections:
+                repeated.add(word)
+            section = sections.setdefault(word, [])
+        elif section is not None:
+            section.append(line)
+    forbidden_words = {w: parse_forbidden_words(ws) for w, ws in sections.items()}
+    return {
+        w: forbidden_words[w]
+        for w in words
+        if forbidden_words.get(w) and w not in repeated
+    }
+
+
+# A batch of one word uses the single-word request.
+async def request_forbidden_words(
     *,
     language: str,
-    word: str,
-) -> ForbiddenWordsResult:
+    words: list[str],
+    cache: LlmCache | None,
+) -> tuple[SimpleLlmResponse, dict[str, list[str]]]:
+    if len(words) == 1:
+        response = await simple_llm_request(
+            model=MODEL,
+            reasoning_effort=REASONING_EFFORT,
+            system_message=REQUEST.format(language=language),
+            user_message=words[0],
+            cache=cache,
+        )
+        forbidden_words = parse_forbidden_words(response.text.split("\n"))
+        if not forbidden_words:
+            return response, {}
+        return response, {words[0]: forbidden_words}
     response = await simple_llm_request(
         model=MODEL,
         reasoning_effort=REASONING_EFFORT,
-        system_message=REQUEST.format(language=language),
-        user_message=word,
+        system_message=BATCH_REQUEST.format(language=language),
+        user_message="\n".join(words),
+        cache=cache,
     )
-    words = response.text.split("\n")
-    return ForbiddenWordsResult(
-        word=word,
-        forbidden_words=words,
-        cost_usd=response.cost_usd,
+    return response, parse_batch_response(response.text, words)
+
+
+# Retries only the words that didn't get a usable answer. Retries bypass the
+# cache, which would return the same answer again. `on_result` is called for
+# each word as soon as it has an answer.
+async def gen_forbidden_words_batch(
+    *,
+    language: str,
+    words: list[str],
+    cache: LlmCache | None,
+    on_result: Callable[[ForbiddenWordsResult], None] | None = None,
+    max_attempts: int = 3,
+) -> ForbiddenWordsBatch:
+    batch = ForbiddenWordsBatch()
+    remaining = words
+    for attempt in range(max_attempts):
+        if not remaining:
+            break
+        response, forbidden_words = await request_forbidden_words(
+            language=language,
+            words=remaining,
+            cache=cache if attempt == 0 else None,
+        )
+        batch.requests += 1
+        batch.cost_usd += response.cost_usd
+        batch.prompt_tokens += response.prompt_tokens
+        batch.completion_tokens += response.completion_tokens
+        for word, ws in forbidden_words.items():
+            result = ForbiddenWordsResult(
+                word=word,
+                forbidden_words=ws,
+                cost_usd=response.cost_usd / len(forbidden_words),
+            )
+            batch.results.append(result)
+            if on_result is not None:
+                on_result(result)
+        remaining = [w for w in remaining if w not in forbidden_words]
+    batch.failed_words = remaining
+    return batch
+
+
+async def gen_forbidden_words(
+    *,
+    language: str,
+    words: list[str],
+    batch_size: int,
+    cache: LlmCache | None,
+    on_result: Callable[[ForbiddenWordsResult], None] | None = None,
+) -> ForbiddenWordsBatch:
+    batches = [words[i : i + batch_size] for i in range(0, len(words), batch_size)]
+    results = await parallel_process(
+        batches,
+        lambda batch_words: gen_forbidden_words_batch(
+            language=language,
+            words=batch_words,
+            cache=cache,
+            on_result=on_result,
+        ),
+        console=console,
+        progress_description="Generating forbidden words",
+        # Requests in flight are limited per model.
+        max_parallel_requests=MAX_LLM_CONCURRENCY,
     )
+    total = ForbiddenWordsBatch()
+    for result in results:
+        if result.status == "success":
+            total.add(result.value)
+    return total
 
 
 async def generate_forbidden_words(
-    *, source_lexicon_path: Path, target_lexicon_path: Path
+    *,
+    source_lexicon_path: Path,
+    target_lexicon_path: Path,
+    batch_size: int,
+    cache: LlmCache | None,
 ):
     source_lexicon = yaml_to_lexicon(source_lexicon_path.read_text(encoding="utf-8"))
     assert source_lexicon.kind == "standard"
@@ -88,44 +245,64 @@ async def generate_forbidden_words(
             words={},
         )
 
-    words_to_process = [
-        word for word in source_words if word not in target_lexicon.words
-    ]
+    def apply(r: ForbiddenWordsResult):
+        target_lexicon.words[r.word] = r.forbidden_words
 
-    if len(words_to_process) == 0:
-        console.print("No words to process")
-        return
+    def save():
+        target_lexicon.words = {k: v for k, v in sorted(target_lexicon.words.items())}
+        with write_atomically(target_lexicon_path) as f:
+            write_lexicon_yaml(target_lexicon, f)
 
-    results = await parallel_process(
-        words_to_process,
-        lambda word: gen_forbidden_words(language=source_lexicon.language, word=word),
-        console=console,
-        progress_description="Generating forbidden words",
-    )
+    # Results are journaled as they arrive and the lexicon is saved every few
+    # seconds, so an interrupted run loses almost nothing.
+    with ResultJournal(
+        journal_path(target_lexicon_path), ForbiddenWordsResult, apply=apply, save=save
+    ) as journal:
+        if replayed := journal.replay():
+            console.print(f"Recovered {replayed} words from {journal.path}")
 
-    total_cost = 0
-    for result in results:
-        if result.status == "success":
-            r = result.value
-            target_lexicon.words[r.word] = r.forbidden_words
-            total_cost += r.cost_usd
+        words_to_process = [
+            word for word in source_words if word not in target_lexicon.words
+        ]
+
+        if len(words_to_process) == 0:
+            console.print("No words to process")
+            return
 
-    target_lexicon.words = {k: v for k, v in sorted(target_lexicon.words.items())}
-    target_lexicon_path.write_text(lexicon_to_yaml(target_lexicon), encoding="utf-8")
+        generated = await gen_forbidden_words(
+            language=source_lexicon.language,
+            words=words_to_process,
+            batch_size=batch_size,
+            cache=cache,
+            on_result=journal.append,
+        )
+    if generated.failed_words:
+        console.print(f"No usable answer for: {', '.join(generated.failed_words)}")
     console.print(f"Saved to {target_lexicon_path}")
-    console.print(f"Total cost: {total_cost:.2f}$")
+    console.print(f"Total cost: {generated.cost_usd:.2f}$")
+    if cache is not None:
+        console.print(f"Cache: {cache.stats}")
 
 
 def main(
     source_lexicon_path: Path,
     target_lexicon_path: Path,
+    batch_size: Annotated[
+        int, typer.Option(min=1, help="Number of words generated in one request")
+    ] = 1,
+    cache: Annotated[
+        bool, typer.Option(help="Reuse responses to identical earlier requests")
+    ] = False,
 ):
-    asyncio.run(
-        generate_forbidden_words(
-            source_lexicon_path=source_lexicon_path,
-            target_lexicon_path=target_lexicon_path,
+    with LlmCache() if cache else contextlib.nullcontext() as llm_cache:
+        asyncio.run(
+            generate_forbidden_words(
+                source_lexicon_path=source_lexicon_path,
+                target_lexicon_path=target_lexicon_path,
+                batch_size=batch_size,
+                cache=llm_cache,
+            )
         )
-    )
 
 
 if __name__ == "__main__":
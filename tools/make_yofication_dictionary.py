@@ -1,45 +1,146 @@
-from tools.utils.defines import ASSERT_LEXICON_ROOT, YOFICATION_DICTIONARY_YAML
-from tools.utils.lexicon import yaml_to_lexicon
-from tools.utils.yoficator import Yoficator
+import hashlib
+import time
+from collections import Counter
+from pathlib import Path
 
+import typer
+from pydantic import BaseModel
 
-def make_yofication_dictionary():
-    full_yoficator = Yoficator.from_ru_wiktionary()
-    if YOFICATION_DICTIONARY_YAML.exists():
-        dictionary_yoficator = Yoficator.from_yofication_dictionary()
-    else:
-        dictionary_yoficator = Yoficator(yofications={})
-    all_words: set[str] = set()
+from tools.utils.defines import (
+    ASSERT_LEXICON_ROOT,
+    YOFICATION_DICTIONARY_MANIFEST_JSON,
+    YOFICATION_DICTIONARY_YAML,
+)
+from tools.utils.lexicon import LexiconCache, file_digest, load_lexicon
+from tools.utils.lexicon_corpus import LexiconCorpus
+from tools.utils.yoficator import LayeredYoficator, Yoficator
+
+
+class YoficationManifest(BaseModel):
+    """What the yofication dictionary has been built from.
+
+    `dictionary_digest` is the digest of the dictionary written by the last run:
+    if the dictionary has been changed since, all words are processed again.
+    `lexicons` maps lexicon file names to their digests, and `words` holds
+    short hashes of all processed е-words.
+    """
+
+    dictionary_digest: str = ""
+    lexicons: dict[str, str] = {}
+    words: list[str] = []
+
+
+# Digest of a dictionary file, or of the shard names and digests of a sharded
+# dictionary. Empty if there is no dictionary.
+def dictionary_digest(path: Path) -> str:
+    if not path.exists():
+        return ""
+    if not path.is_dir():
+        return file_digest(path)
+    shards = "".join(
+        f"{shard.name}:{file_digest(shard)}\n" for shard in sorted(path.glob("*.yaml"))
+    )
+    return hashlib.blake2b(shards.encode("utf-8")).hexdigest()
+
+
+def word_hash(word: str) -> str:
+    return hashlib.blake2b(word.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def load_manifest(full: bool) -> YoficationManifest:
+    if full or not YOFICATION_DICTIONARY_MANIFEST_JSON.exists():
+        return YoficationManifest()
+    manifest = YoficationManifest.model_validate_json(
+        YOFICATION_DICTIONARY_MANIFEST_JSON.read_bytes()
+    )
+    if manifest.dictionary_digest != dictionary_digest(YOFICATION_DICTIONARY_YAML):
+        print("Yofication dictionary has been changed, processing all words")
+        return YoficationManifest()
+    return manifest
 
-    for lexicon_path in ASSERT_LEXICON_ROOT.glob("*.yaml"):
-        lexicon = yaml_to_lexicon(lexicon_path.read_text(encoding="utf-8"))
+
+def save_manifest(manifest: YoficationManifest):
+    manifest.words.sort()
+    YOFICATION_DICTIONARY_MANIFEST_JSON.write_text(
+        manifest.model_dump_json(indent=2) + "\n", encoding="utf-8"
+    )
+
+
+# Russian е-words from the lexicons that changed since the last run which have
+# not been processed yet.
+def new_words(
+    manifest: YoficationManifest, lexicon_digests: dict[str, str]
+) -> list[str]:
+    cache = LexiconCache()
+    lexicons = {}
+    for name, digest in lexicon_digests.items():
+        if manifest.lexicons.get(name) == digest:
+            continue
+        lexicon = load_lexicon(
+            ASSERT_LEXICON_ROOT / name, trusted=True, lazy=True, cache=cache
+        )
         if lexicon.language == "Russian":
-            match lexicon.kind:
-                case "standard":
-                    all_words.update(lexicon.words)
-                case "taboo":
-                    all_words.update(lexicon.words.keys())
-                    all_words.update(
-                        word for words in lexicon.words.values() for word in words
-                    )
-                case _:
-                    raise ValueError(f"Unknown lexicon kind: {lexicon.kind}")
-
-    for w in all_words:
-        w_lower = w.lower()
-        if (
-            "е" in w_lower
-            and not "ё" in w_lower
-            and not dictionary_yoficator.contains(w)
-        ):
-            try:
-                yofications = full_yoficator(w)
-            except KeyError:
-                yofications = ["???"]
-            dictionary_yoficator.yofications[w] = yofications
-
-    dictionary_yoficator.save_to_yofication_dictionary()
+            lexicons[name] = lexicon
+    processed = set(manifest.words)
+    return sorted(
+        w
+        for w in LexiconCorpus(lexicons).words("Russian")
+        if "е" in w.lower() and "ё" not in w.lower() and word_hash(w) not in processed
+    )
+
+
+def main(
+    full: bool = typer.Option(
+        False, help="Process all words, ignoring the manifest of the last run"
+    ),
+    sharded: bool | None = typer.Option(
+        None,
+        help="Convert the dictionary to one file per initial letter or back. "
+        "By default the current layout is kept",
+    ),
+):
+    start = time.perf_counter()
+    manifest = load_manifest(full)
+    lexicon_digests = {
+        path.name: file_digest(path)
+        for path in sorted(ASSERT_LEXICON_ROOT.glob("*.yaml"))
+    }
+    words = new_words(manifest, lexicon_digests)
+    print(f"{len(words)} new words ({time.perf_counter() - start:.2f}s)")
+    convert = sharded is not None and sharded != YOFICATION_DICTIONARY_YAML.is_dir()
+    if not words and not convert:
+        if manifest.lexicons != lexicon_digests:
+            manifest.lexicons = lexicon_digests
+            save_manifest(manifest)
+        return
+
+    dictionary_yofications: dict[str, list[str]] = {}
+    if YOFICATION_DICTIONARY_YAML.exists():
+        dictionary_yofications.update(
+            Yoficator.from_yofication_dictionary().yofications
+        )
+    dictionary_yoficator = Yoficator(yofications=dictionary_yofications)
+    yoficator = LayeredYoficator.default(dictionary_yoficator)
+
+    answered_by: Counter[str] = Counter()
+    for w in words:
+        result = yoficator.lookup(w)
+        answered_by[result.layer if result is not None else "none"] += 1
+        if result is None:
+            dictionary_yofications[w] = ["???"]
+        elif result.layer != "yofication_dictionary":
+            dictionary_yofications[w] = result.yofications
+
+    print(f"Answered by: {dict(answered_by)}")
+    print(f"Loaded layers: {yoficator.loaded_layers}")
+    dictionary_yoficator.save_to_yofication_dictionary(sharded=sharded)
+
+    manifest.words.extend(word_hash(w) for w in words)
+    manifest.lexicons = lexicon_digests
+    manifest.dictionary_digest = dictionary_digest(YOFICATION_DICTIONARY_YAML)
+    save_manifest(manifest)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
-    make_yofication_dictionary()
+    typer.run(main)
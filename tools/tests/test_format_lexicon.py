@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import pytest
+
+from tools.format_lexicon import expand_lexicon_paths, main
+from tools.utils.tests.test_lexicon import TEST_STANDARD_LEXICON
+
+UNFORMATTED_LEXICON = TEST_STANDARD_LEXICON.replace(
+    '- "hello"\n- "world"\n', '- "world"\n- "hello"\n- "world"\n'
+)
+
+
+def test_expand_lexicon_paths(tmp_path: Path):
+    (tmp_path / "words").mkdir()
+    for name in ["words/b.yaml", "words/a.yaml", "words/notes.txt", "c.yaml"]:
+        (tmp_path / name).write_text("", encoding="utf-8")
+    a, b, c = tmp_path / "words/a.yaml", tmp_path / "words/b.yaml", tmp_path / "c.yaml"
+    assert expand_lexicon_paths([tmp_path / "words"]) == [a, b]
+    assert expand_lexicon_paths([tmp_path / "words" / "?.yaml"]) == [a, b]
+    assert expand_lexicon_paths([tmp_path / "*.yaml"]) == [c]
+    # Files are kept in order, without repeats. Missing files are kept for
+    # the error to name them.
+    assert expand_lexicon_paths([c, tmp_path / "words", b, tmp_path / "d.yaml"]) == [
+        c,
+        a,
+        b,
+        tmp_path / "d.yaml",
+    ]
+    with pytest.raises(FileNotFoundError, match="No lexicons match .*x"):
+        expand_lexicon_paths([c, tmp_path / "x*.yaml"])
+    (tmp_path / "empty").mkdir()
+    with pytest.raises(FileNotFoundError, match="No lexicons match .*empty"):
+        expand_lexicon_paths([tmp_path / "empty"])
+
+
+def test_check(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    formatted = tmp_path / "formatted.yaml"
+    formatted.write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    unformatted = tmp_path / "unformatted.yaml"
+    unformatted.write_text(UNFORMATTED_LEXICON, encoding="utf-8")
+
+    main([formatted], check=True, jobs=1)
+    assert capsys.readouterr().out == ""
+
+    with pytest.raises(SystemExit) as exc_info:
+        main([tmp_path], check=True, jobs=2)
+    assert exc_info.value.code == 1
+    assert capsys.readouterr().out == f"Would reformat {unformatted}\n"
+    assert unformatted.read_text(encoding="utf-8") == UNFORMATTED_LEXICON
+
+    main([tmp_path], jobs=2)
+    assert capsys.readouterr().out == f"Reformatted {unformatted}\n"
+    assert unformatted.read_text(encoding="utf-8") == TEST_STANDARD_LEXICON
+    main([tmp_path], check=True, jobs=2)
@@ -3,6 +3,7 @@ from pathlib import Path
 REPO_ROOT = Path(__file__).parent.parent.parent
 ASSERT_LEXICON_ROOT = REPO_ROOT / "hatgame" / "lexicon"
 WAREHOUSE_LEXICON_ROOT = REPO_ROOT / "warehouse" / "lexicon"
+CACHE_ROOT = REPO_ROOT / ".cache"
 
 RU_WIKTIONARY_WORD_FORMS_ZIP = (
     WAREHOUSE_LEXICON_ROOT / "ru" / "ru_wiktionary_word_forms.zip"
@@ -10,6 +11,9 @@ RU_WIKTIONARY_WORD_FORMS_ZIP = (
 YOFICATION_DICTIONARY_YAML = (
     WAREHOUSE_LEXICON_ROOT / "ru" / "yofication_dictionary.yaml"
 )
+YOFICATION_DICTIONARY_MANIFEST_JSON = (
+    WAREHOUSE_LEXICON_ROOT / "ru" / "yofication_dictionary.manifest.json"
+)
 
 E2YO_KERNEL_SAFE_TXT = WAREHOUSE_LEXICON_ROOT / "ru" / "e2yo_kernel_safe.txt"
 E2YO_KERNEL_NOT_SAFE_TXT = WAREHOUSE_LEXICON_ROOT / "ru" / "e2yo_kernel_not_safe.txt"
@@ -0,0 +1,28 @@
+import contextlib
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Literal, TextIO, overload
+
+
+@overload
+def write_atomically(
+    path: Path, mode: Literal["w"] = "w"
+) -> contextlib.AbstractContextManager[TextIO]: ...
+@overload
+def write_atomically(
+    path: Path, mode: Literal["wb"]
+) -> contextlib.AbstractContextManager[BinaryIO]: ...
+# Replaces `path` only when the whole content has been written, so readers and
+# interrupted writers never leave a truncated file. Text is written in UTF-8.
+@contextlib.contextmanager
+def write_atomically(path: Path, mode: Literal["w", "wb"] = "w") -> Iterator[IO[Any]]:
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, mode, encoding="utf-8" if mode == "w" else None) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
@@ -0,0 +1,104 @@
+import hashlib
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import TextIO
+
+from pydantic import BaseModel, ValidationError
+
+from tools.utils.defines import CACHE_ROOT
+
+JOURNAL_ROOT = CACHE_ROOT / "journal"
+
+
+# Journal of the run writing `output`. Journals live in the cache, keyed by
+# the output's name and absolute path.
+def journal_path(output: Path) -> Path:
+    path_hash = hashlib.blake2b(
+        str(output.resolve()).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    return JOURNAL_ROOT / f"{output.name}.{path_hash}.jsonl"
+
+
+class ResultJournal[T: BaseModel]:
+    """Results of a long run, appended to a JSONL file as they arrive.
+
+    `apply` adds a result to the output of the run, and `save` writes the
+    output. Every `checkpoint_interval` seconds the output is saved and the
+    journal is truncated, so each result is either in the output or in the
+    journal. `replay` applies results left by an interrupted run. The output
+    is not saved if no results have been applied.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        value_type: type[T],
+        *,
+        apply: Callable[[T], None],
+        save: Callable[[], None],
+        checkpoint_interval: float = 10.0,
+    ):
+        self.path = path
+        self.value_type = value_type
+        self.apply = apply
+        self.save = save
+        self.checkpoint_interval = checkpoint_interval
+        self._file: TextIO | None = None
+        self._unsaved = False
+        self._last_checkpoint = time.monotonic()
+
+    # Applies and saves the journaled results. Returns their number.
+    def replay(self) -> int:
+        if not self.path.exists():
+            return 0
+        count = 0
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                value = self.value_type.model_validate_json(line)
+            except ValidationError:
+                # The last line is incomplete if the run was killed mid-write.
+                continue
+            self.apply(value)
+            self._unsaved = True
+            count += 1
+        # Removes the journal, so new results don't follow an incomplete line.
+        self.checkpoint()
+        return count
+
+    def append(self, value: T):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")  # noqa: SIM115
+        self._file.write(value.model_dump_json() + "\n")
+        # Flushed to the OS, the line survives the process being killed.
+        self._file.flush()
+        self.apply(value)
+        self._unsaved = True
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        if self._unsaved:
+            self.save()
+            self._unsaved = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.path.unlink(missing_ok=True)
+        self._last_checkpoint = time.monotonic()
+
+    # Saves the output and removes the journal.
+    def close(self):
+        self.checkpoint()
+
+    def __enter__(self) -> "ResultJournal[T]":
+        return self
+
+    # On errors the journal is kept for the next run to replay.
+    def __exit__(self, exc_type: type[BaseException] | None, *exc_info: object):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
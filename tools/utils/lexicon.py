@@ -1,8 +1,22 @@
+import contextlib
 import datetime
-from typing import Any, Literal
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, TextIO, overload
 
 import yaml
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+from tools.utils.defines import CACHE_ROOT
+from tools.utils.files import write_atomically
 
 
 class LexiconBase(BaseModel):
@@ -10,6 +24,19 @@ class LexiconBase(BaseModel):
     language: str
     updated_at: datetime.date
 
+    # Set for lexicons loaded with `lazy=True` until the words are loaded.
+    _words_loader: Callable[[], Any] | None = PrivateAttr(default=None)
+
+    if not TYPE_CHECKING:
+
+        def __getattr__(self, name: str) -> Any:
+            if name == "words" and self._words_loader is not None:
+                words = self._words_loader()
+                self._words_loader = None
+                self.words = words
+                return words
+            return super().__getattr__(name)
+
 
 class StandardLexicon(LexiconBase):
     kind: Literal["standard"]
@@ -24,47 +51,361 @@ class TabooLexicon(LexiconBase):
 Lexicon = StandardLexicon | TabooLexicon
 
 
-def yaml_to_lexicon(content: str) -> Lexicon:
-    documents = list(yaml.safe_load_all(content))
-    assert len(documents) == 2
-    header, body = documents
+# "pyyaml" is the pure-Python reference loader, "libyaml" uses the C bindings
+# when PyYAML was built with them, and "fast" recognizes the exact shape written
+# by `lexicon_to_yaml` and falls back to "libyaml" on anything else.
+LexiconLoader = Literal["pyyaml", "libyaml", "fast"]
+
+_LIBYAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Characters that PyYAML reads verbatim inside a double-quoted scalar: no
+# quotes, escapes, line breaks, BOM or non-printable characters.
+_PLAIN_CHARS = r"[^\"\\\x00-\x1f\x7f-\x9f\u2028\u2029\ud800-\udfff\ufeff\ufffe\uffff]"
+_HEADER_LINE = rf'([a-z_]+): (?:"({_PLAIN_CHARS}*)"|(\d{{4}}-\d\d-\d\d))\n'
+_LIST_ITEM = rf'- "({_PLAIN_CHARS}*)"\n'
+_MAP_ENTRY = rf'"({_PLAIN_CHARS}*)":\n((?:- "{_PLAIN_CHARS}*"\n)+)'
+_HEADER_LINE_REGEXP = re.compile(_HEADER_LINE)
+_HEADER_REGEXP = re.compile(rf"(?:{_HEADER_LINE})+")
+_LIST_ITEM_REGEXP = re.compile(_LIST_ITEM)
+_LIST_REGEXP = re.compile(rf"(?:{_LIST_ITEM})+")
+_MAP_ENTRY_REGEXP = re.compile(_MAP_ENTRY)
+_MAP_REGEXP = re.compile(rf"(?:{_MAP_ENTRY})+")
+
+
+# With `trusted=True` the words are not validated. Only use it for lexicons
+# that are known to be well-formed, e.g. the ones under `ASSERT_LEXICON_ROOT`.
+def yaml_to_lexicon(
+    content: str, *, loader: LexiconLoader = "fast", trusted: bool = False
+) -> Lexicon:
+    header, body = _load_lexicon_documents(content, loader)
     assert isinstance(header, dict)
     data: dict[str, Any] = header.copy()
     data["words"] = body
+    return _make_lexicon(data, trusted=trusted)
+
+
+# With `lazy=True` only the header is read upfront, and the rest of the file is
+# loaded on the first access to `words`.
+def load_lexicon(
+    path: Path,
+    *,
+    loader: LexiconLoader = "fast",
+    trusted: bool = False,
+    lazy: bool = False,
+    cache: "LexiconCache | None" = None,
+) -> Lexicon:
+    header = _read_lexicon_header(path, loader) if lazy else None
+    if header is None:
+        if cache is not None:
+            return cache.load(path, loader=loader, trusted=trusted)
+        return yaml_to_lexicon(
+            path.read_text(encoding="utf-8"), loader=loader, trusted=trusted
+        )
+    assert isinstance(header, dict)
+    if not trusted:
+        LexiconBase.model_validate(header)
+    lexicon = _make_lexicon(header, trusted=True)
+    lexicon._words_loader = lambda: (
+        load_lexicon(path, loader=loader, trusted=trusted, cache=cache).words
+    )
+    return lexicon
+
+
+def _make_lexicon(data: dict[str, Any], *, trusted: bool) -> Lexicon:
+    lexicon_type: type[Lexicon]
     match data["kind"]:
         case "standard":
-            return StandardLexicon(**data)
+            lexicon_type = StandardLexicon
         case "taboo":
-            return TabooLexicon(**data)
+            lexicon_type = TabooLexicon
         case _:
             raise ValueError(f"Unknown lexicon kind: {data['kind']}")
+    if trusted:
+        return lexicon_type.model_construct(**data)
+    return lexicon_type(**data)
+
+
+# Reads the file up to the document separator. Returns None if there is no
+# header document in front of the separator.
+def _read_lexicon_header(path: Path, loader: LexiconLoader) -> Any:
+    header_lines: list[str] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.rstrip("\n") == "---":
+                break
+            header_lines.append(line)
+        else:
+            return None
+    if not header_lines:
+        return None
+    header_text = "".join(header_lines)
+    match loader:
+        case "fast":
+            header = _fast_load_lexicon_header(header_text)
+            if header is not None:
+                return header
+            return yaml.load(header_text, Loader=_LIBYAML_SAFE_LOADER)
+        case "libyaml":
+            return yaml.load(header_text, Loader=_LIBYAML_SAFE_LOADER)
+        case "pyyaml":
+            return yaml.safe_load(header_text)
+
+
+def _load_lexicon_documents(content: str, loader: LexiconLoader) -> tuple[Any, Any]:
+    match loader:
+        case "fast":
+            documents = _fast_load_lexicon_documents(content)
+            if documents is not None:
+                return documents
+            return _load_lexicon_documents(content, "libyaml")
+        case "libyaml":
+            documents = list(yaml.load_all(content, Loader=_LIBYAML_SAFE_LOADER))
+        case "pyyaml":
+            documents = list(yaml.safe_load_all(content))
+    assert len(documents) == 2
+    header, body = documents
+    return header, body
+
+
+# Returns None if the content is not in the canonical lexicon format.
+def _fast_load_lexicon_documents(content: str) -> tuple[Any, Any] | None:
+    header_text, separator, body_text = content.partition("\n---\n")
+    if not separator:
+        return None
+    header = _fast_load_lexicon_header(header_text + "\n")
+    if header is None:
+        return None
+    body: Any
+    if _LIST_REGEXP.fullmatch(body_text):
+        body = _LIST_ITEM_REGEXP.findall(body_text)
+    elif _MAP_REGEXP.fullmatch(body_text):
+        body = {
+            key: _LIST_ITEM_REGEXP.findall(items)
+            for key, items in _MAP_ENTRY_REGEXP.findall(body_text)
+        }
+    else:
+        return None
+    return header, body
+
+
+def _fast_load_lexicon_header(header_text: str) -> dict[str, Any] | None:
+    if not _HEADER_REGEXP.fullmatch(header_text):
+        return None
+    header: dict[str, Any] = {}
+    for key, string_value, date_value in _HEADER_LINE_REGEXP.findall(header_text):
+        header[key] = (
+            datetime.date.fromisoformat(date_value) if date_value else string_value
+        )
+    return header
+
+
+class LexiconCache:
+    """On-disk cache of parsed lexicon files.
+
+    Parsed documents are pickled under the blake2b digest of the file content.
+    The digest itself is remembered for the file's path along with its size
+    and mtime, so unchanged files are not even read. When the cache grows over
+    `max_size_bytes`, least recently used entries are removed.
+
+    The cache can be shared by several processes: entries are written
+    atomically, and an entry that can't be written, read or unpickled is a
+    cache miss.
+    """
+
+    def __init__(
+        self, root: Path = CACHE_ROOT / "lexicon", *, max_size_bytes: int = 64 << 20
+    ):
+        self.root = root
+        self.max_size_bytes = max_size_bytes
+
+    def load(
+        self, path: Path, *, loader: LexiconLoader = "fast", trusted: bool = False
+    ) -> Lexicon:
+        stat = path.stat()
+        stat_key = f"{stat.st_size}:{stat.st_mtime_ns}"
+        path_entry = self._path_entry_path(path)
+        cached_stat_key, digest = self._read_path_entry(path_entry)
+        if cached_stat_key != stat_key or not digest:
+            digest = file_digest(path)
+            self._write_entry(path_entry, f"{stat_key}:{digest}".encode("ascii"))
+        data_entry = self.root / f"{digest}.lexicon"
+        documents = self._read_data_entry(data_entry)
+        if documents is None:
+            documents = _load_lexicon_documents(
+                path.read_text(encoding="utf-8"), loader
+            )
+            self._write_entry(
+                data_entry, pickle.dumps(documents, pickle.HIGHEST_PROTOCOL)
+            )
+        header, body = documents
+        assert isinstance(header, dict)
+        data: dict[str, Any] = header.copy()
+        data["words"] = body
+        return _make_lexicon(data, trusted=trusted)
+
+    # Removes the entries of the file as it was cached, and as it is now.
+    def invalidate(self, path: Path):
+        path_entry = self._path_entry_path(path)
+        _, digest = self._read_path_entry(path_entry)
+        if digest:
+            (self.root / f"{digest}.lexicon").unlink(missing_ok=True)
+        path_entry.unlink(missing_ok=True)
+        if path.exists():
+            (self.root / f"{file_digest(path)}.lexicon").unlink(missing_ok=True)
+
+    def clear(self):
+        if self.root.exists():
+            for entry in self.root.iterdir():
+                entry.unlink(missing_ok=True)
+
+    def _path_entry_path(self, path: Path) -> Path:
+        key = str(path.resolve())
+        return self.root / f"{hashlib.blake2b(key.encode('utf-8')).hexdigest()}.path"
+
+    # Returns the size and mtime key and the digest, or empty strings.
+    def _read_path_entry(self, entry: Path) -> tuple[str, str]:
+        try:
+            stat_key, _, digest = entry.read_text(encoding="ascii").rpartition(":")
+        except (FileNotFoundError, UnicodeDecodeError):
+            return "", ""
+        return stat_key, digest
+
+    # Returns None if the entry is missing or corrupt. Corrupt entries, e.g.
+    # truncated by a full disk, are removed.
+    def _read_data_entry(self, entry: Path) -> tuple[Any, Any] | None:
+        try:
+            header, body = pickle.loads(entry.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            entry.unlink(missing_ok=True)
+            return None
+        # Evicted by another process in the meantime.
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(entry)
+        return header, body
+
+    def _write_entry(self, entry: Path, data: bytes):
+        self.root.mkdir(parents=True, exist_ok=True)
+        try:
+            with write_atomically(entry, "wb") as f:
+                f.write(data)
+        except OSError:
+            # Not cached this time.
+            return
+        self._evict()
+
+    def _evict(self):
+        entries: list[tuple[int, int, str]] = []
+        for e in os.scandir(self.root):
+            # Other processes' entries being written.
+            if e.name.endswith(".tmp"):
+                continue
+            try:
+                stat = e.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, e.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            Path(entry).unlink(missing_ok=True)
+            total_size -= size
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
 
 
 def lexicon_header_to_yaml(lexicon: Lexicon) -> str:
-    header = {
+    output = io.StringIO()
+    write_lexicon_header_yaml(lexicon, output)
+    return output.getvalue()
+
+
+def lexicon_to_yaml(lexicon: Lexicon) -> str:
+    output = io.StringIO()
+    write_lexicon_yaml(lexicon, output)
+    return output.getvalue()
+
+
+def write_lexicon_header_yaml(lexicon: Lexicon, output: TextIO):
+    header = _lexicon_header(lexicon)
+    if all(
+        isinstance(value, datetime.date)
+        or _can_emit_quoted(value, column=len(key) + len(': "'))
+        for key, value in header.items()
+    ):
+        output.writelines(
+            f"{key}: {value.isoformat()}\n"
+            if isinstance(value, datetime.date)
+            else f'{key}: "{value}"\n'
+            for key, value in header.items()
+        )
+    else:
+        output.write(
+            yaml.dump(
+                header,
+                allow_unicode=True,
+                default_flow_style=False,
+                Dumper=_LEXICON_HEADER_YAML_DUMPER,
+            )
+        )
+
+
+# Writes the same bytes as dumping the lexicon with `yaml.dump`, but formats
+# the canonical layout directly. Lexicons with strings that PyYAML would escape,
+# fold or otherwise treat specially are dumped by PyYAML.
+def write_lexicon_yaml(lexicon: Lexicon, output: TextIO):
+    write_lexicon_header_yaml(lexicon, output)
+    output.write("---\n")
+    match lexicon.kind:
+        case "standard":
+            if lexicon.words and all(
+                map(_EMITTABLE_LIST_ITEM_REGEXP.fullmatch, lexicon.words)
+            ):
+                output.writelines(f'- "{word}"\n' for word in lexicon.words)
+                return
+        case "taboo":
+            if (
+                lexicon.words
+                and all(map(_EMITTABLE_KEY_REGEXP.fullmatch, lexicon.words.keys()))
+                and all(
+                    forbidden
+                    and all(map(_EMITTABLE_LIST_ITEM_REGEXP.fullmatch, forbidden))
+                    for forbidden in lexicon.words.values()
+                )
+            ):
+                output.writelines(
+                    f'"{key}":\n' + "".join(f'- "{word}"\n' for word in forbidden)
+                    for key, forbidden in lexicon.words.items()
+                )
+                return
+    output.write(
+        yaml.dump(
+            lexicon.words,
+            allow_unicode=True,
+            default_flow_style=False,
+            Dumper=_LEXICON_BODY_YAML_DUMPER,
+        )
+    )
+
+
+def _lexicon_header(lexicon: Lexicon) -> dict[str, Any]:
+    return {
         "name": lexicon.name,
         "kind": lexicon.kind,
         "language": lexicon.language,
         "updated_at": lexicon.updated_at,
     }
-    return yaml.dump(
-        header,
-        allow_unicode=True,
-        default_flow_style=False,
-        Dumper=_make_lexicon_yaml_dumper(quote_keys=False),
-    )
 
 
-def lexicon_to_yaml(lexicon: Lexicon) -> str:
+def _can_emit_quoted(value: str, *, column: int) -> bool:
     return (
-        lexicon_header_to_yaml(lexicon)
-        + "---\n"
-        + yaml.dump(
-            lexicon.words,
-            allow_unicode=True,
-            default_flow_style=False,
-            Dumper=_make_lexicon_yaml_dumper(quote_keys=True),
-        )
+        _EMITTABLE_STRING_REGEXP.fullmatch(value) is not None
+        and column + len(value) <= _YAML_LINE_WIDTH
     )
 
 
@@ -95,3 +436,211 @@ def _make_lexicon_yaml_dumper(*, quote_keys: bool):
             return yaml.MappingNode(tag, processed_mapping, flow_style=flow_style)
 
     return ValueQuotingDumper
+
+
+_LEXICON_HEADER_YAML_DUMPER = _make_lexicon_yaml_dumper(quote_keys=False)
+_LEXICON_BODY_YAML_DUMPER = _make_lexicon_yaml_dumper(quote_keys=True)
+
+# PyYAML writes these characters inside double quotes as is (with
+# `allow_unicode=True`) and never folds a double-quoted scalar that ends before
+# `_YAML_LINE_WIDTH`. Empty keys are written as complex keys.
+_YAML_LINE_WIDTH = 80
+_EMITTABLE_CHARS = r"[ !#-\[\]-~\xa0-\u2027\u202a-\ud7ff\ue000-\ufefe\uff00-\ufffd]"
+_EMITTABLE_STRING_REGEXP = re.compile(rf"{_EMITTABLE_CHARS}*")
+_EMITTABLE_LIST_ITEM_REGEXP = re.compile(
+    rf"{_EMITTABLE_CHARS}{{0,{_YAML_LINE_WIDTH - len('- "')}}}"
+)
+_EMITTABLE_KEY_REGEXP = re.compile(
+    rf"{_EMITTABLE_CHARS}{{1,{_YAML_LINE_WIDTH - len('"')}}}"
+)
+
+
+# Compiled lexicons are read-only binary snapshots that can be memory-mapped and
+# indexed without parsing the whole file. Layout (all integers are little-endian
+# uint32):
+#   - fixed header: magic, kind, number of strings, number of taboo entries,
+#     metadata size;
+#   - metadata: JSON with name, language and updated_at;
+#   - string offsets: (number of strings + 1) offsets into the string blob;
+#   - taboo ranges (taboo only): (number of entries + 1) indices of the first
+#     forbidden word of each entry;
+#   - string blob: all strings in UTF-8, back to back.
+# Standard lexicons store words in order. Taboo lexicons store all keys first,
+# followed by forbidden words of every entry in the same order.
+COMPILED_LEXICON_SUFFIX = ".lexbin"
+
+_COMPILED_LEXICON_MAGIC = b"HATLEX\x00\x01"
+_COMPILED_LEXICON_HEADER = struct.Struct("<8sB3xIII")
+_COMPILED_LEXICON_KINDS: list[Literal["standard", "taboo"]] = ["standard", "taboo"]
+_UINT32 = struct.Struct("<I")
+_UINT32_PAIR = struct.Struct("<II")
+
+
+def compile_lexicon(lexicon: Lexicon, path: Path):
+    match lexicon.kind:
+        case "standard":
+            strings = list(lexicon.words)
+            ranges: list[int] = []
+        case "taboo":
+            strings = list(lexicon.words.keys())
+            ranges = []
+            for forbidden in lexicon.words.values():
+                ranges.append(len(strings))
+                strings.extend(forbidden)
+            ranges.append(len(strings))
+    metadata = json.dumps(
+        {
+            "name": lexicon.name,
+            "language": lexicon.language,
+            "updated_at": lexicon.updated_at.isoformat(),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    encoded_strings = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for s in encoded_strings:
+        offsets.append(offsets[-1] + len(s))
+    path.write_bytes(
+        b"".join(
+            [
+                _COMPILED_LEXICON_HEADER.pack(
+                    _COMPILED_LEXICON_MAGIC,
+                    _COMPILED_LEXICON_KINDS.index(lexicon.kind),
+                    len(strings),
+                    len(lexicon.words) if lexicon.kind == "taboo" else 0,
+                    len(metadata),
+                ),
+                metadata,
+                struct.pack(f"<{len(offsets)}I", *offsets),
+                struct.pack(f"<{len(ranges)}I", *ranges),
+                *encoded_strings,
+            ]
+        )
+    )
+
+
+def open_compiled_lexicon(path: Path) -> "CompiledLexicon":
+    return CompiledLexicon(path)
+
+
+class CompiledWords(Sequence[str]):
+    """Read-only view of consecutive strings in a compiled lexicon."""
+
+    def __init__(self, lexicon: "CompiledLexicon", start: int, stop: int):
+        self._lexicon = lexicon
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[str]: ...
+    def __getitem__(self, index: int | slice) -> str | Sequence[str]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return CompiledWords(
+                    self._lexicon, self._start + start, self._start + max(start, stop)
+                )
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("compiled lexicon index out of range")
+        return self._lexicon._string(self._start + index)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._start, self._stop):
+            yield self._lexicon._string(i)
+
+
+class CompiledLexicon:
+    """Memory-mapped compiled lexicon, see `compile_lexicon`.
+
+    `words` holds the words of a standard lexicon or the keys of a taboo
+    lexicon. Forbidden words of a taboo lexicon are available by key index via
+    `forbidden_words`.
+    """
+
+    name: str
+    kind: Literal["standard", "taboo"]
+    language: str
+    updated_at: datetime.date
+    words: CompiledWords
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, kind, num_strings, num_entries, metadata_size = (
+            _COMPILED_LEXICON_HEADER.unpack_from(self._mmap, 0)
+        )
+        if magic != _COMPILED_LEXICON_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a compiled lexicon")
+        metadata_start = _COMPILED_LEXICON_HEADER.size
+        metadata = json.loads(
+            self._mmap[metadata_start : metadata_start + metadata_size]
+        )
+        self.name = metadata["name"]
+        self.kind = _COMPILED_LEXICON_KINDS[kind]
+        self.language = metadata["language"]
+        self.updated_at = datetime.date.fromisoformat(metadata["updated_at"])
+        self._offsets_start = metadata_start + metadata_size
+        self._ranges_start = self._offsets_start + (num_strings + 1) * _UINT32.size
+        num_ranges = num_entries + 1 if self.kind == "taboo" else 0
+        self._blob_start = self._ranges_start + num_ranges * _UINT32.size
+        num_words = num_entries if self.kind == "taboo" else num_strings
+        self.words = CompiledWords(self, 0, num_words)
+
+    def forbidden_words(self, index: int) -> CompiledWords:
+        assert self.kind == "taboo"
+        if index < 0:
+            index += len(self.words)
+        if not 0 <= index < len(self.words):
+            raise IndexError("compiled lexicon index out of range")
+        start, stop = _UINT32_PAIR.unpack_from(
+            self._mmap, self._ranges_start + index * _UINT32.size
+        )
+        return CompiledWords(self, start, stop)
+
+    def to_lexicon(self) -> Lexicon:
+        match self.kind:
+            case "standard":
+                return StandardLexicon(
+                    name=self.name,
+                    kind="standard",
+                    language=self.language,
+                    updated_at=self.updated_at,
+                    words=list(self.words),
+                )
+            case "taboo":
+                return TabooLexicon(
+                    name=self.name,
+                    kind="taboo",
+                    language=self.language,
+                    updated_at=self.updated_at,
+                    words={
+                        key: list(self.forbidden_words(i))
+                        for i, key in enumerate(self.words)
+                    },
+                )
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> "CompiledLexicon":
+        return self
+
+    def __exit__(self, *args: object):
+        self.close()
+
+    def _string(self, index: int) -> str:
+        start, stop = _UINT32_PAIR.unpack_from(
+            self._mmap, self._offsets_start + index * _UINT32.size
+        )
+        return self._mmap[self._blob_start + start : self._blob_start + stop].decode(
+            "utf-8"
+        )
@@ -0,0 +1,113 @@
+import functools
+from collections.abc import Collection
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+from tools.utils.defines import ASSERT_LEXICON_ROOT
+from tools.utils.lexicon import Lexicon, LexiconCache, load_lexicon
+
+
+class WordOccurrence(NamedTuple):
+    lexicon: str
+    kind: Literal["standard", "taboo"]
+    role: Literal["headword", "forbidden"]
+    # Index of the word in a standard lexicon or of the entry in a taboo lexicon.
+    position: int
+
+
+class LexiconCorpus:
+    """A set of lexicons with an inverted index from words to their occurrences.
+
+    Lexicons are keyed by file name without the extension.
+    """
+
+    def __init__(self, lexicons: dict[str, Lexicon]):
+        self.lexicons = lexicons
+        self.index: dict[str, list[WordOccurrence]] = {}
+        words_by_language: dict[str, set[str]] = {}
+        for key, lexicon in lexicons.items():
+            language_words = words_by_language.setdefault(lexicon.language, set())
+            match lexicon.kind:
+                case "standard":
+                    for position, word in enumerate(lexicon.words):
+                        self._add(
+                            word, WordOccurrence(key, "standard", "headword", position)
+                        )
+                    language_words.update(lexicon.words)
+                case "taboo":
+                    for position, (word, forbidden) in enumerate(lexicon.words.items()):
+                        self._add(
+                            word, WordOccurrence(key, "taboo", "headword", position)
+                        )
+                        for forbidden_word in forbidden:
+                            self._add(
+                                forbidden_word,
+                                WordOccurrence(key, "taboo", "forbidden", position),
+                            )
+                        language_words.add(word)
+                        language_words.update(forbidden)
+        self._words_by_language = {
+            language: frozenset(words) for language, words in words_by_language.items()
+        }
+
+    # Loads lexicons in parallel. If `languages` is given, other lexicons are
+    # skipped after reading their headers.
+    @classmethod
+    def load(
+        cls,
+        root: Path = ASSERT_LEXICON_ROOT,
+        *,
+        languages: Collection[str] | None = None,
+        cache: LexiconCache | None = None,
+        max_workers: int | None = None,
+    ) -> "LexiconCorpus":
+        paths = sorted(root.glob("*.yaml"))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            lexicons = list(
+                executor.map(
+                    functools.partial(
+                        _load_corpus_lexicon, languages=languages, cache=cache
+                    ),
+                    paths,
+                )
+            )
+        return cls(
+            {
+                path.stem: lexicon
+                for path, lexicon in zip(paths, lexicons, strict=True)
+                if lexicon is not None
+            }
+        )
+
+    def occurrences(self, word: str) -> list[WordOccurrence]:
+        return self.index.get(word, [])
+
+    def lexicons_containing(self, word: str) -> list[str]:
+        return list(dict.fromkeys(o.lexicon for o in self.occurrences(word)))
+
+    # Words that are used as headwords in more than one lexicon.
+    def duplicate_headwords(self) -> dict[str, list[WordOccurrence]]:
+        duplicates: dict[str, list[WordOccurrence]] = {}
+        for word, occurrences in self.index.items():
+            headword_occurrences = [o for o in occurrences if o.role == "headword"]
+            if len({o.lexicon for o in headword_occurrences}) > 1:
+                duplicates[word] = headword_occurrences
+        return duplicates
+
+    # All headwords and forbidden words in the given language.
+    def words(self, language: str) -> frozenset[str]:
+        return self._words_by_language.get(language, frozenset())
+
+    def _add(self, word: str, occurrence: WordOccurrence):
+        self.index.setdefault(word, []).append(occurrence)
+
+
+def _load_corpus_lexicon(
+    path: Path, *, languages: Collection[str] | None, cache: LexiconCache | None
+) -> Lexicon | None:
+    lexicon = load_lexicon(path, trusted=True, lazy=True, cache=cache)
+    if languages is not None and lexicon.language not in languages:
+        return None
+    lexicon.words  # noqa: B018 - load words before sending the lexicon back
+    return lexicon
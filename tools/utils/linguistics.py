@@ -1,11 +1,12 @@
 import re
 import unicodedata
-from collections.abc import Iterable
+from collections import Counter
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
 
 # Allow apostrophes for words like "д'Артаньян"
 RUSSIAN_WORD_REGEXP = re.compile(r"^([а-яёА-ЯЁ][а-яёА-ЯЁ'-]*[а-яёА-ЯЁ]|[а-яёА-ЯЁ])$")
 RELAXED_RUSSIAN_WORD_REGEXP = re.compile(r"^[а-яёА-ЯЁ' -]+$")
-STRESSES_REGEXP = re.compile(r"[\u0300\u0301]")
 # TODO: Finish list
 ADDITIONAL_STRESS_REPLACEMENTS = {
     "á": "а",
@@ -15,6 +16,20 @@ ADDITIONAL_STRESS_REPLACEMENTS = {
     "ѝ": "и",
     "Ѝ": "И",
 }
+SUBWORD_SEPARATORS_REGEXP = re.compile(r"[,/]")
+
+_STRESS_REPLACEMENTS = {**ADDITIONAL_STRESS_REPLACEMENTS, "\u0300": "", "\u0301": ""}
+_STRESS_REMOVAL_TABLE = str.maketrans(_STRESS_REPLACEMENTS)
+# Stress removal plus apostrophe normalization. Applied to long texts with
+# `str.replace`: it is several times faster than `str.translate` with a dict
+# table on non-ASCII text, which is the common case here.
+_WORD_CLEANING_REPLACEMENTS = [*_STRESS_REPLACEMENTS.items(), ("’", "'")]
+_WORD_REJECTION_REASONS = [
+    ("latin", re.compile(r"[a-zA-Z]")),
+    ("digits", re.compile(r"\d")),
+    ("whitespace", re.compile(r"\s")),
+    ("edge_punctuation", re.compile(r"^['-]|['-]$")),
+]
 
 
 def is_russian_word(word: str) -> bool:
@@ -26,29 +41,130 @@ def is_relaxed_russian_word(word: str) -> bool:
 
 
 def remove_stresses(word: str) -> str:
-    word = "".join(ADDITIONAL_STRESS_REPLACEMENTS.get(ch, ch) for ch in word)
-    return STRESSES_REGEXP.sub("", word)
+    return word.translate(_STRESS_REMOVAL_TABLE)
+
+
+@dataclass
+class WordCleaningResult:
+    # Russian words extracted from the input, in order.
+    words: list[str] = field(default_factory=list)
+    # Subwords that are not Russian words, with the reason.
+    rejected: list[tuple[str, str]] = field(default_factory=list)
+    # - "total": number of input words;
+    # - "stresses": input words changed by normalization;
+    # - "skipped": input words with at least one rejected subword;
+    # - "compound": input words with several Russian subwords;
+    # - "rejected_<reason>": number of rejected subwords by reason.
+    counts: Counter[str] = field(default_factory=Counter)
+
+
+# Removes stresses, normalizes apostrophes, splits words on "," and "/" and
+# keeps only Russian words. Processes all words at once: normalization is
+# applied to the joined text, and words that are already clean Russian words
+# skip splitting altogether.
+def clean_russian_words(words: Sequence[str]) -> WordCleaningResult:
+    result = WordCleaningResult()
+    cleaned_words = _clean_text("\n".join(words)).split("\n")
+    if len(cleaned_words) != len(words):
+        # Some words contain line breaks.
+        cleaned_words = [_clean_text(w) for w in words]
+    result.counts["total"] += len(words)
+    result.counts["stresses"] += sum(map(str.__ne__, words, cleaned_words))
+    for cleaned_word in cleaned_words:
+        if RUSSIAN_WORD_REGEXP.match(cleaned_word):
+            result.words.append(cleaned_word.strip())
+            continue
+        subwords = [
+            w.strip()
+            for w in SUBWORD_SEPARATORS_REGEXP.split(cleaned_word)
+            if w.strip()
+        ]
+        num_russian_subwords = 0
+        for subword in subwords:
+            if is_russian_word(subword):
+                result.words.append(subword)
+                num_russian_subwords += 1
+            else:
+                reason = _word_rejection_reason(subword)
+                result.rejected.append((subword, reason))
+                result.counts[f"rejected_{reason}"] += 1
+        if num_russian_subwords != len(subwords):
+            result.counts["skipped"] += 1
+        if num_russian_subwords > 1:
+            result.counts["compound"] += 1
+    return result
+
+
+def _clean_text(text: str) -> str:
+    for old, new in _WORD_CLEANING_REPLACEMENTS:
+        if old in text:
+            text = text.replace(old, new)
+    return text
+
+
+def _word_rejection_reason(word: str) -> str:
+    for reason, regexp in _WORD_REJECTION_REASONS:
+        if regexp.search(word):
+            return reason
+    return "other"
+
+
+# Sort keys compare words character by character, with "ё" treated as "е"
+# followed by the largest code point. Thus "ё" goes after "е" followed by
+# anything, but before "ж".
+_YO_SORT_KEY = "е\U0010ffff"
+_CAPITAL_YO_SORT_KEY = "Е\U0010ffff"
+# UTF-8 preserves code point order, so encoded keys sort the same way.
+_YO_SORT_KEY_UTF8 = ("ё".encode(), _YO_SORT_KEY.encode())
+_CAPITAL_YO_SORT_KEY_UTF8 = ("Ё".encode(), _CAPITAL_YO_SORT_KEY.encode())
 
 
 def ru_sort_key_with_case(word: str) -> str:
-    def map_letter(ch: str) -> str:
-        if ch == "ё":
-            return "е1"
-        elif ch == "Ё":
-            return "Е1"
-        else:
-            return f"{ch}0"
-
-    return "".join([map_letter(ch) for ch in unicodedata.normalize("NFC", word)])
+    return (
+        unicodedata.normalize("NFC", word)
+        .replace("ё", _YO_SORT_KEY)
+        .replace("Ё", _CAPITAL_YO_SORT_KEY)
+    )
 
 
 def ru_sort_key_ignore_case(word: str) -> str:
     return ru_sort_key_with_case(word.casefold())
 
 
+# Computes UTF-8 encoded sort keys for all words at once: the words are joined
+# and normalized as a single string, which is much faster than doing it word by
+# word.
+def ru_sort_keys(words: Sequence[str], *, ignore_case: bool) -> list[bytes]:
+    if not words:
+        return []
+    text = "\n".join(words)
+    if ignore_case:
+        text = text.casefold()
+    keys = (
+        unicodedata.normalize("NFC", text)
+        .encode("utf-8", "surrogatepass")
+        .replace(*_YO_SORT_KEY_UTF8)
+        .replace(*_CAPITAL_YO_SORT_KEY_UTF8)
+        .split(b"\n")
+    )
+    if len(keys) != len(words):
+        # Some words contain line breaks.
+        key_func = ru_sort_key_ignore_case if ignore_case else ru_sort_key_with_case
+        keys = [key_func(w).encode("utf-8", "surrogatepass") for w in words]
+    return keys
+
+
+# Returns indices of words in sorted order. The sort is stable.
+def ru_argsort(words: Sequence[str], *, ignore_case: bool) -> list[int]:
+    keys = ru_sort_keys(words, ignore_case=ignore_case)
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+
 def ru_sorted_with_case(words: Iterable[str]) -> list[str]:
-    return sorted(words, key=ru_sort_key_with_case)
+    words = list(words)
+    return [words[i] for i in ru_argsort(words, ignore_case=False)]
 
 
 def ru_sorted_ignore_case(words: Iterable[str]) -> list[str]:
-    return sorted(words, key=ru_sort_key_ignore_case)
+    words = list(words)
+    return [words[i] for i in ru_argsort(words, ignore_case=True)]
@@ -1,17 +1,406 @@
-from typing import Literal
+import asyncio
+import datetime
+import hashlib
+import json
+import sqlite3
+import time
+import weakref
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal, NamedTuple
 
 from litellm import Choices, acompletion
-from litellm.cost_calculator import completion_cost
-from litellm.types.utils import ModelResponse
+from litellm.cost_calculator import batch_cost_calculator, completion_cost
+from litellm.exceptions import RateLimitError, ServiceUnavailableError, Timeout
+from litellm.litellm_core_utils.get_llm_provider_logic import get_llm_provider
+from litellm.types.utils import ModelResponse, Usage
+from litellm.utils import token_counter
+from openai import AsyncOpenAI
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+
+from tools.utils.defines import CACHE_ROOT
+from tools.utils.rate_limit import AimdConcurrency, RateLimiter, RateLimits
 
 ReasoningEffort = Literal["none", "minimal", "low", "medium", "high", "default"]
 
+# Provider limits of the account, by model. Models without limits are only
+# limited by the adaptive concurrency.
+MODEL_RATE_LIMITS: dict[str, RateLimits] = {
+    # Gemini API, tier 1.
+    "gemini/gemini-2.5-pro": RateLimits(
+        requests_per_minute=150, tokens_per_minute=2_000_000
+    ),
+}
+
+# Upper bound of the requests in flight to one model. The actual number is
+# found by `AimdConcurrency`, so callers can let this many requests wait.
+MAX_LLM_CONCURRENCY = 256
+
 
 class SimpleLlmResponse(BaseModel):
     text: str
     cost_usd: float
+    # Zero for cached responses, like the cost.
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+@dataclass
+class LlmCacheStats:
+    hits: int = 0
+    misses: int = 0
+    # Requests that waited for an identical request in flight. Also hits.
+    deduplicated: int = 0
+    cost_saved_usd: float = 0.0
+
+
+# Writes between exact recounts of the size of an `LlmCache`.
+_RECOUNT_INTERVAL = 1000
+
+
+class LlmCache:
+    """On-disk cache of LLM responses in SQLite.
+
+    Responses are keyed by the blake2b digest of the model, reasoning effort
+    and messages. Entries older than `ttl` are not returned, and when the
+    responses take more than `max_size_bytes`, the oldest ones are removed.
+    The total size is kept as a running count, so writes don't scan the
+    table. It is recounted every `_RECOUNT_INTERVAL` writes, which also picks
+    up other processes' writes and removes expired entries.
+    Identical requests made while one is in flight wait for its response
+    instead of calling the provider again. Cached responses cost nothing.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_ROOT / "llm.sqlite",
+        *,
+        ttl: datetime.timedelta | None = datetime.timedelta(days=30),
+        max_size_bytes: int = 256 << 20,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_size_bytes = max_size_bytes
+        self.stats = LlmCacheStats()
+        self._in_flight: dict[str, asyncio.Task[SimpleLlmResponse]] = {}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        # With WAL, a commit doesn't wait for fsync, and readers in other
+        # processes don't block writers.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, cost_usd REAL NOT NULL, "
+            "size INTEGER NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_created_at ON responses(created_at)"
+        )
+        self._total_size = 0
+        self._writes = 0
+        self._recount()
+        self._evict()
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self) -> "LlmCache":
+        return self
+
+    def __exit__(self, *exc_info: object):
+        self.close()
+
+    # Returns the cached response with its original cost, or None.
+    def get(self, key: str) -> SimpleLlmResponse | None:
+        row = self._db.execute(
+            "SELECT text, cost_usd FROM responses WHERE key = ? AND created_at >= ?",
+            (key, self._min_created_at()),
+        ).fetchone()
+        if row is None:
+            return None
+        return SimpleLlmResponse(text=row[0], cost_usd=row[1])
+
+    def put(self, key: str, response: SimpleLlmResponse):
+        size = len(key) + len(response.text.encode("utf-8"))
+        replaced = self._db.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, response.text, response.cost_usd, size, time.time()),
+        )
+        self._total_size += size - (replaced[0] if replaced is not None else 0)
+        self._writes += 1
+        if self._writes % _RECOUNT_INTERVAL == 0:
+            self._recount()
+        if self._total_size > self.max_size_bytes:
+            self._evict()
+        self._db.commit()
+
+    async def get_or_request(
+        self, key: str, request: Callable[[], Awaitable[SimpleLlmResponse]]
+    ) -> SimpleLlmResponse:
+        cached = self.get(key)
+        if cached is not None:
+            self.stats.hits += 1
+            self.stats.cost_saved_usd += cached.cost_usd
+            return SimpleLlmResponse(text=cached.text, cost_usd=0.0)
+        task = self._in_flight.get(key)
+        if task is not None:
+            # Shielded, so cancelling a waiter doesn't cancel the request.
+            response = await asyncio.shield(task)
+            self.stats.hits += 1
+            self.stats.deduplicated += 1
+            self.stats.cost_saved_usd += response.cost_usd
+            return SimpleLlmResponse(text=response.text, cost_usd=0.0)
+        self.stats.misses += 1
+        task = asyncio.ensure_future(self._request(key, request))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _request(
+        self, key: str, request: Callable[[], Awaitable[SimpleLlmResponse]]
+    ) -> SimpleLlmResponse:
+        response = await request()
+        self.put(key, response)
+        return response
+
+    def _min_created_at(self) -> float:
+        if self.ttl is None:
+            return float("-inf")
+        return time.time() - self.ttl.total_seconds()
+
+    # Removes expired responses and counts the size of the others. Scans the
+    # whole table.
+    def _recount(self):
+        self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (self._min_created_at(),)
+        )
+        (self._total_size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    # Removes the oldest responses while over the size limit. Rows are read
+    # lazily in index order, so only the removed ones are read.
+    def _evict(self):
+        evicted: list[tuple[str]] = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY created_at"
+        ):
+            if self._total_size <= self.max_size_bytes:
+                break
+            evicted.append((key,))
+            self._total_size -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+
+class _BatchRequest(NamedTuple):
+    custom_id: str
+    model: str
+    body: dict[str, Any]
+    response: asyncio.Future[SimpleLlmResponse]
+
+
+class LlmBatchBackend:
+    """Sends requests through an OpenAI-compatible batch API.
+
+    Requests are collected until none has arrived for `collect_delay` seconds
+    or `max_batch_size` are pending for one model. They are then written to a
+    JSONL batch file per model, since a batch can't mix models, which is
+    uploaded and submitted as a batch job. The job is polled
+    every `poll_interval` seconds, and when it ends each caller gets its own
+    response. Costs use the provider's batch prices.
+
+    Callers must not limit the number of requests in flight, or the batch
+    will never fill up: a batch only goes out when its callers are waiting.
+
+    Only OpenAI models are supported. `models` are checked when the backend is
+    created, so a run with another provider fails before any request is made.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        *,
+        models: Iterable[str] = (),
+        collect_delay: float = 1.0,
+        poll_interval: float = 30.0,
+        max_batch_size: int = 50000,
+        completion_window: Literal["24h"] = "24h",
+    ):
+        for model in models:
+            _batch_model_name(model)
+        self.client = client or AsyncOpenAI()
+        self.collect_delay = collect_delay
+        self.poll_interval = poll_interval
+        self.max_batch_size = max_batch_size
+        self.completion_window: Literal["24h"] = completion_window
+        # By model name.
+        self._pending: dict[str, list[_BatchRequest]] = {}
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._jobs: set[asyncio.Task[None]] = set()
+        self._next_id = 0
+
+    async def request(
+        self,
+        *,
+        model: str,
+        reasoning_effort: ReasoningEffort | None,
+        system_message: str,
+        user_message: str,
+    ) -> SimpleLlmResponse:
+        model_name = _batch_model_name(model)
+        body: dict[str, Any] = {
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": user_message},
+            ],
+        }
+        if reasoning_effort is not None:
+            body["reasoning_effort"] = reasoning_effort
+        loop = asyncio.get_running_loop()
+        request = _BatchRequest(
+            custom_id=f"request-{self._next_id}",
+            model=model,
+            body=body,
+            response=loop.create_future(),
+        )
+        self._next_id += 1
+        pending = self._pending.setdefault(model_name, [])
+        pending.append(request)
+        if len(pending) >= self.max_batch_size:
+            self._submit(self._pending.pop(model_name))
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = (
+            loop.call_later(self.collect_delay, self._flush) if self._pending else None
+        )
+        return await request.response
+
+    def _flush(self):
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        for requests in pending.values():
+            self._submit(requests)
+
+    def _submit(self, requests: list[_BatchRequest]):
+        job = asyncio.create_task(self._run_job(requests))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _run_job(self, requests: list[_BatchRequest]):
+        try:
+            responses = await self._submit_and_wait(requests)
+        except Exception as e:
+            for request in requests:
+                if not request.response.done():
+                    request.response.set_exception(e)
+            return
+        for request in requests:
+            if request.response.done():
+                continue
+            response = responses.get(request.custom_id)
+            if isinstance(response, SimpleLlmResponse):
+                request.response.set_result(response)
+            else:
+                request.response.set_exception(
+                    RuntimeError(response or f"No response to {request.custom_id}")
+                )
+
+    # Returns responses or error messages by custom ID.
+    async def _submit_and_wait(
+        self, requests: list[_BatchRequest]
+    ) -> dict[str, SimpleLlmResponse | str]:
+        batch_file = "".join(
+            json.dumps(
+                {
+                    "custom_id": r.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": r.body,
+                },
+                ensure_ascii=False,
+            )
+            + "\n"
+            for r in requests
+        )
+        input_file = await self.client.files.create(
+            file=("batch.jsonl", batch_file.encode("utf-8")), purpose="batch"
+        )
+        job = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        while job.status in ("validating", "in_progress", "finalizing"):
+            await asyncio.sleep(self.poll_interval)
+            job = await self.client.batches.retrieve(job.id)
+        if job.status != "completed":
+            raise RuntimeError(f"Batch job {job.id} is {job.status}: {job.errors}")
+
+        models = {r.custom_id: r.model for r in requests}
+        results: dict[str, SimpleLlmResponse | str] = {}
+        for file_id in (job.output_file_id, job.error_file_id):
+            if file_id is None:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    result = json.loads(line)
+                    custom_id = result["custom_id"]
+                    results[custom_id] = _parse_batch_result(
+                        result, models.get(custom_id, "")
+                    )
+        return results
+
+
+# Model name for the batch file. Raises ValueError for other providers, which
+# would only fail after the batch is uploaded.
+def _batch_model_name(model: str) -> str:
+    model_name, provider, _, _ = get_llm_provider(model)
+    if provider != "openai":
+        raise ValueError(
+            f"Batch jobs only support OpenAI models, not {model} ({provider})"
+        )
+    return model_name
+
+
+# Returns the response, or an error message.
+def _parse_batch_result(result: dict[str, Any], model: str) -> SimpleLlmResponse | str:
+    response = result.get("response") or {}
+    body = response.get("body") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        return f"{result['custom_id']} failed: {result.get('error') or body}"
+    content = body["choices"][0]["message"]["content"]
+    if content is None:
+        return f"{result['custom_id']} has no content: {body}"
+    usage = Usage(**body.get("usage", {}))
+    prompt_cost, completion_cost = batch_cost_calculator(usage, model)
+    return SimpleLlmResponse(
+        text=content,
+        cost_usd=prompt_cost + completion_cost,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+    )
+
+
+def llm_cache_key(
+    *,
+    model: str,
+    reasoning_effort: ReasoningEffort | None,
+    system_message: str,
+    user_message: str,
+) -> str:
+    request = json.dumps(
+        [model, reasoning_effort, system_message, user_message], ensure_ascii=False
+    )
+    return hashlib.blake2b(request.encode("utf-8")).hexdigest()
 
 
 async def simple_llm_request(
@@ -20,20 +409,90 @@ async def simple_llm_request(
     reasoning_effort: ReasoningEffort | None = None,
     system_message: str,
     user_message: str,
-):
+    cache: LlmCache | None = None,
+    batch_backend: LlmBatchBackend | None = None,
+) -> SimpleLlmResponse:
+    async def request() -> SimpleLlmResponse:
+        return await (
+            batch_backend.request if batch_backend is not None else _llm_request
+        )(
+            model=model,
+            reasoning_effort=reasoning_effort,
+            system_message=system_message,
+            user_message=user_message,
+        )
+
+    if cache is None:
+        return await request()
+    key = llm_cache_key(
+        model=model,
+        reasoning_effort=reasoning_effort,
+        system_message=system_message,
+        user_message=user_message,
+    )
+    return await cache.get_or_request(key, request)
+
+
+# Limiters hold asyncio primitives, which can't outlive their event loop.
+_rate_limiters: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, RateLimiter]
+] = weakref.WeakKeyDictionary()
+
+
+# Rate limiter shared by all requests to `model` in the running event loop.
+def model_rate_limiter(model: str) -> RateLimiter:
+    limiters = _rate_limiters.setdefault(asyncio.get_running_loop(), {})
+    limiter = limiters.get(model)
+    if limiter is None:
+        limiter = limiters[model] = RateLimiter(
+            MODEL_RATE_LIMITS.get(model, RateLimits()),
+            AimdConcurrency(maximum=MAX_LLM_CONCURRENCY),
+            is_congestion=_is_congestion,
+        )
+    return limiter
+
+
+def _is_congestion(e: BaseException) -> bool:
+    return isinstance(
+        e, RateLimitError | ServiceUnavailableError | Timeout | TimeoutError
+    )
+
+
+async def _llm_request(
+    *,
+    model: str,
+    reasoning_effort: ReasoningEffort | None,
+    system_message: str,
+    user_message: str,
+) -> SimpleLlmResponse:
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+    limiter = model_rate_limiter(model)
+    # Completion tokens are unknown beforehand: they are taken from the bucket
+    # when the response reports them.
+    estimated_tokens = (
+        token_counter(model=model, messages=messages)
+        if limiter.tokens is not None
+        else 0
+    )
+
+    # Each attempt waits for the limiter, and the random wait keeps requests
+    # failed together from being retried together.
     @retry(
-        wait=wait_exponential(min=2, max=30),
+        wait=wait_random_exponential(min=2, max=30),
         stop=stop_after_attempt(3),
     )
     async def do_gen():
-        return await acompletion(
-            model=model,
-            reasoning_effort=reasoning_effort,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message},
-            ],
-        )
+        async with limiter.request(estimated_tokens) as request:
+            response = await acompletion(
+                model=model, reasoning_effort=reasoning_effort, messages=messages
+            )
+            usage = getattr(response, "usage", None)
+            if isinstance(usage, Usage):
+                request.used_tokens = usage.total_tokens
+            return response
 
     response = await do_gen()
     assert isinstance(response, ModelResponse)
@@ -42,7 +501,11 @@ async def simple_llm_request(
     message = response.choices[0].message
     assert message.content is not None, response.model_dump_json(indent=2)
     cost = completion_cost(completion_response=response, model=model)
+    usage = getattr(response, "usage", None)
+    assert isinstance(usage, Usage), response.model_dump_json(indent=2)
     return SimpleLlmResponse(
         text=message.content,
         cost_usd=cost,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
     )
@@ -1,6 +1,14 @@
 import asyncio
 import traceback
-from collections.abc import Awaitable, Callable, Sequence
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Sequence,
+    Sized,
+)
 from typing import Literal
 
 from pydantic import BaseModel
@@ -34,36 +42,100 @@ async def parallel_process[In, Out](
     console: Console,
     progress_description: str = "Processing",
     max_parallel_requests: int = 16,
+    on_success: Callable[[Out], None] | None = None,
 ) -> list[ProcessingResult[Out]]:
-    pbar = tqdm(total=len(items), desc=progress_description)
-    semaphore = asyncio.Semaphore(max_parallel_requests)
+    results: list[ProcessingResult[Out]] = [ProcessingCancelled() for _ in items]
+    try:
+        async for index, result in parallel_process_stream(
+            items,
+            process_item,
+            progress_description=progress_description,
+            workers=max(1, min(max_parallel_requests, len(items))),
+            on_success=on_success,
+        ):
+            results[index] = result
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        console.print("\nInterrupted. Aborting...")
+    return results
+
+
+# Processes items from a (possibly async and endless) iterator with `workers`
+# tasks and yields `(index, result)` as items complete, in completion order.
+# The iterator is only advanced when a worker is free, so memory doesn't grow
+# with the input. Stopping the iteration cancels the items in progress. If the
+# iterator fails, the error is raised after the items taken from it are done.
+async def parallel_process_stream[In, Out](
+    items: Iterable[In] | AsyncIterable[In],
+    process_item: Callable[[In], Awaitable[Out]],
+    *,
+    progress_description: str = "Processing",
+    workers: int = 16,
+    on_success: Callable[[Out], None] | None = None,
+) -> AsyncIterator[tuple[int, ProcessingResult[Out]]]:
+    assert workers > 0
+    pbar = tqdm(
+        total=len(items) if isinstance(items, Sized) else None,
+        desc=progress_description,
+    )
+    # `None` tells a worker or the consumer that there is nothing left. Both
+    # queues are bounded, so a slow consumer stops the workers, and busy
+    # workers stop the producer.
+    inputs: asyncio.Queue[tuple[int, In] | None] = asyncio.Queue(workers)
+    outputs: asyncio.Queue[tuple[int, ProcessingResult[Out]] | None] = asyncio.Queue(
+        workers
+    )
+    producer_error: Exception | None = None
+
+    async def produce():
+        nonlocal producer_error
+        index = 0
+        try:
+            if isinstance(items, AsyncIterable):
+                async for item in items:
+                    await inputs.put((index, item))
+                    index += 1
+            else:
+                for item in items:
+                    await inputs.put((index, item))
+                    index += 1
+        except Exception as e:
+            producer_error = e
+        for _ in range(workers):
+            await inputs.put(None)
 
-    async def do_process_item(item: In) -> ProcessingResult[Out]:
-        async with semaphore:
+    async def work():
+        while (entry := await inputs.get()) is not None:
+            index, item = entry
+            result: ProcessingResult[Out]
             try:
-                return ProcessingSuccess[Out](value=await process_item(item))
+                value = await process_item(item)
+                # Called as soon as the item is done, e.g. to journal the value.
+                if on_success is not None:
+                    on_success(value)
+                result = ProcessingSuccess[Out](value=value)
             except Exception as e:
                 pbar.write(f"Error processing '{item}':\n{traceback.format_exc()}")
-                return ProcessingError(error=str(e))
-            finally:
-                pbar.update(1)
-
-    tasks = [asyncio.create_task(do_process_item(item)) for item in items]
+                result = ProcessingError(error=str(e))
+            pbar.update(1)
+            await outputs.put((index, result))
+        await outputs.put(None)
 
+    tasks = [
+        asyncio.create_task(produce()),
+        *(asyncio.create_task(work()) for _ in range(workers)),
+    ]
     try:
-        await asyncio.gather(*tasks, return_exceptions=True)
+        running = workers
+        while running:
+            entry = await outputs.get()
+            if entry is None:
+                running -= 1
+            else:
+                yield entry
+        if producer_error is not None:
+            raise producer_error
+    finally:
         pbar.close()
-    except (KeyboardInterrupt, asyncio.CancelledError):
-        pbar.close()
-        console.print("\nInterrupted. Aborting...")
         for task in tasks:
-            if not task.done():
-                task.cancel()
-
-    results: list[ProcessingResult[Out]] = []
-    for task in tasks:
-        if task.cancelled():
-            results.append(ProcessingCancelled())
-        else:
-            results.append(task.result())
-    return results
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
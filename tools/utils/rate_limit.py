@@ -0,0 +1,196 @@
+import asyncio
+import contextlib
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Literal, NamedTuple
+
+
+class RateLimits(NamedTuple):
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+
+
+class TokenBucket:
+    """Token bucket refilled at `per_minute` tokens per minute.
+
+    A request larger than `capacity` waits for a full bucket and leaves it in
+    debt, which later requests wait out. Waiters are served in order, so a
+    large request is not starved by small ones.
+    """
+
+    def __init__(self, per_minute: float, *, capacity: float | None = None):
+        self.rate = per_minute / 60
+        # Ten seconds worth of tokens by default: enough to start a run quickly,
+        # small enough not to exceed a per-minute limit in one burst.
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate * 10)
+        self._level = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        async with self._lock:
+            needed = min(amount, self.capacity)
+            while self._refill() < needed:
+                await asyncio.sleep((needed - self._level) / self.rate)
+            self._level -= amount
+
+    # Returns tokens to the bucket, or takes more with a negative `amount`.
+    def adjust(self, amount: float):
+        self._refill()
+        self._level = min(self.capacity, self._level + amount)
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        return self._level
+
+
+# - "success": the request succeeded;
+# - "congestion": the provider is overloaded: rate limited or timed out;
+# - "error": any other failure.
+RequestOutcome = Literal["success", "congestion", "error"]
+
+
+class AimdConcurrency:
+    """Concurrency limit tuned by additive increase, multiplicative decrease.
+
+    While requests succeed, the limit grows by one per `limit` successful
+    requests, as long as at least half of the limit is used and the latency
+    and error rate stay within bounds. On congestion the limit is multiplied by
+    `decrease_factor`, once per congestion event: failures of requests
+    started before the last decrease don't decrease it again.
+    """
+
+    def __init__(
+        self,
+        initial: float = 16,
+        *,
+        minimum: float = 1,
+        maximum: float = 256,
+        decrease_factor: float = 0.5,
+        # Latency is unhealthy if it is this many times the lowest one seen.
+        latency_tolerance: float = 2.0,
+        max_error_rate: float = 0.1,
+    ):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.in_flight = 0
+        # Exponential moving averages.
+        self.latency: float | None = None
+        self.min_latency: float | None = None
+        self.error_rate = 0.0
+        self._last_decrease = float("-inf")
+        self._condition = asyncio.Condition()
+
+    # Waits for a free slot and returns the start time to pass to `release`.
+    async def acquire(self) -> float:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started_at: float, outcome: RequestOutcome):
+        now = time.monotonic()
+        # Without enough demand, a higher limit would be untested.
+        saturated = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+        self.error_rate = 0.9 * self.error_rate + 0.1 * (outcome != "success")
+        match outcome:
+            case "success":
+                latency = now - started_at
+                self.latency = (
+                    latency
+                    if self.latency is None
+                    else 0.9 * self.latency + 0.1 * latency
+                )
+                self.min_latency = min(self.min_latency or self.latency, self.latency)
+                if saturated and self.healthy:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            case "congestion":
+                if started_at >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            case "error":
+                pass
+        async with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def healthy(self) -> bool:
+        latency_ok = (
+            self.latency is None
+            or self.min_latency is None
+            or self.latency <= self.latency_tolerance * self.min_latency
+        )
+        return latency_ok and self.error_rate <= self.max_error_rate
+
+
+class RateLimitedRequest:
+    def __init__(self, estimated_tokens: float):
+        self.estimated_tokens = estimated_tokens
+        # Set by the caller when the provider reports the usage.
+        self.used_tokens: float | None = None
+
+
+class RateLimiter:
+    """Limits requests to one model: requests and tokens per minute, and the
+    number of requests in flight.
+
+    Tokens are taken from the bucket by estimate before a request and
+    corrected by the reported usage after it.
+    """
+
+    def __init__(
+        self,
+        limits: RateLimits | None = None,
+        concurrency: AimdConcurrency | None = None,
+        *,
+        is_congestion: Callable[[BaseException], bool] = lambda e: isinstance(
+            e, TimeoutError
+        ),
+    ):
+        limits = limits or RateLimits()
+        self.requests = (
+            TokenBucket(limits.requests_per_minute)
+            if limits.requests_per_minute is not None
+            else None
+        )
+        self.tokens = (
+            TokenBucket(limits.tokens_per_minute)
+            if limits.tokens_per_minute is not None
+            else None
+        )
+        self.concurrency = concurrency or AimdConcurrency()
+        self.is_congestion = is_congestion
+
+    @contextlib.asynccontextmanager
+    async def request(
+        self, estimated_tokens: float = 0
+    ) -> AsyncIterator[RateLimitedRequest]:
+        request = RateLimitedRequest(estimated_tokens)
+        started_at = await self.concurrency.acquire()
+        outcome: RequestOutcome = "error"
+        try:
+            if self.requests is not None:
+                await self.requests.acquire()
+            if self.tokens is not None:
+                await self.tokens.acquire(estimated_tokens)
+            # Time waiting for the buckets is not the provider's latency.
+            started_at = time.monotonic()
+            yield request
+            outcome = "success"
+        except BaseException as e:
+            if self.is_congestion(e):
+                outcome = "congestion"
+            raise
+        finally:
+            if self.tokens is not None and request.used_tokens is not None:
+                self.tokens.adjust(estimated_tokens - request.used_tokens)
+            await self.concurrency.release(started_at, outcome)
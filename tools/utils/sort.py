@@ -1,9 +1,17 @@
-from collections.abc import Callable, Iterable
-from typing import TYPE_CHECKING
+import heapq
+import pickle
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import ExitStack
+from itertools import batched
+from operator import itemgetter
+from typing import IO, TYPE_CHECKING, Any
 
 if TYPE_CHECKING:
     from _typeshed import SupportsRichComparison
 
+_RUN_CHUNK_SIZE = 4096
+
 
 def sorted_unique[V, K: SupportsRichComparison](
     items: Iterable[V], key: Callable[[V], K]
@@ -14,3 +22,54 @@ def sorted_unique[V, K: SupportsRichComparison](
         if k not in seen:
             seen[k] = item
     return sorted(seen.values(), key=key)
+
+
+# Same as `sorted_unique`, but keeps at most `max_run_size` items in memory.
+# Larger inputs are split into sorted runs stored in temporary files, which are
+# then merged lazily. Items and keys must be picklable.
+def iter_sorted_unique[V, K: SupportsRichComparison](
+    items: Iterable[V], key: Callable[[V], K], *, max_run_size: int = 1_000_000
+) -> Iterator[V]:
+    with ExitStack() as stack:
+        runs: list[IO[bytes]] = []
+        seen: dict[K, V] = {}
+        for item in items:
+            k = key(item)
+            if k not in seen:
+                seen[k] = item
+                if len(seen) >= max_run_size:
+                    runs.append(
+                        _write_run(stack.enter_context(tempfile.TemporaryFile()), seen)
+                    )
+                    seen = {}
+        if not runs:
+            yield from (seen[k] for k in sorted(seen))
+            return
+        if seen:
+            runs.append(_write_run(stack.enter_context(tempfile.TemporaryFile()), seen))
+        # `heapq.merge` is stable, so the first occurrence of each key wins,
+        # same as in `sorted_unique`.
+        last_key: K | None = None
+        for i, (k, item) in enumerate(
+            heapq.merge(*(_read_run(run) for run in runs), key=itemgetter(0))
+        ):
+            if i == 0 or k != last_key:
+                yield item
+                last_key = k
+
+
+def _write_run(run: IO[bytes], seen: dict[Any, Any]) -> IO[bytes]:
+    pairs = sorted(seen.items(), key=itemgetter(0))
+    for chunk in batched(pairs, _RUN_CHUNK_SIZE, strict=False):
+        pickle.dump(chunk, run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def _read_run(run: IO[bytes]) -> Iterator[tuple[Any, Any]]:
+    while True:
+        try:
+            chunk = pickle.load(run)
+        except EOFError:
+            return
+        yield from chunk
@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pytest
+
+from tools.utils.files import write_atomically
+
+
+def test_write_atomically(tmp_path: Path):
+    path = tmp_path / "output.txt"
+    path.write_text("old", encoding="utf-8")
+    with pytest.raises(RuntimeError), write_atomically(path) as f:
+        f.write("new")
+        raise RuntimeError("interrupted")
+    assert path.read_text(encoding="utf-8") == "old"
+    with write_atomically(path) as f:
+        f.write("ёж")
+    assert path.read_text(encoding="utf-8") == "ёж"
+    with write_atomically(path, "wb") as f:
+        f.write(b"\x00\xff")
+    assert path.read_bytes() == b"\x00\xff"
+    assert list(tmp_path.iterdir()) == [path]
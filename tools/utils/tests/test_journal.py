@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+from tools.utils.files import write_atomically
+from tools.utils.journal import ResultJournal, journal_path
+
+
+class Result(BaseModel):
+    word: str
+    value: int
+
+
+class Output:
+    def __init__(self, path: Path):
+        self.path = path
+        self.results: dict[str, int] = {}
+        self.saves = 0
+
+    def apply(self, result: Result):
+        self.results[result.word] = result.value
+
+    def save(self):
+        self.saves += 1
+        with write_atomically(self.path) as f:
+            for word, value in sorted(self.results.items()):
+                f.write(f"{word} {value}\n")
+
+    def journal(self, path: Path, **kwargs: float) -> ResultJournal[Result]:
+        return ResultJournal(path, Result, apply=self.apply, save=self.save, **kwargs)
+
+
+def test_journal_path(tmp_path: Path):
+    path = journal_path(tmp_path / "a" / "lexicon.yaml")
+    assert path.name.startswith("lexicon.yaml.")
+    assert path.suffix == ".jsonl"
+    assert path != journal_path(tmp_path / "b" / "lexicon.yaml")
+
+
+def test_result_journal(tmp_path: Path):
+    journal_file = tmp_path / "journal.jsonl"
+    output = Output(tmp_path / "output.txt")
+    with (
+        pytest.raises(KeyboardInterrupt),
+        output.journal(journal_file, checkpoint_interval=3600) as journal,
+    ):
+        assert journal.replay() == 0
+        journal.append(Result(word="кот", value=1))
+        journal.append(Result(word="пёс", value=2))
+        raise KeyboardInterrupt
+    # Nothing is saved before a checkpoint, but the results are journaled.
+    assert output.saves == 0
+    assert not output.path.exists()
+    # The run was killed in the middle of a line.
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.write('{"word": "ёж", "va')
+
+    output = Output(tmp_path / "output.txt")
+    with output.journal(journal_file, checkpoint_interval=3600) as journal:
+        assert journal.replay() == 2
+        assert output.path.read_text(encoding="utf-8") == "кот 1\nпёс 2\n"
+        assert not journal_file.exists()
+        journal.append(Result(word="ёж", value=3))
+        assert journal_file.exists()
+    assert output.path.read_text(encoding="utf-8") == "кот 1\nпёс 2\nёж 3\n"
+    assert not journal_file.exists()
+    assert output.saves == 2
+
+
+def test_result_journal_checkpoints(tmp_path: Path):
+    journal_file = tmp_path / "journal.jsonl"
+    output = Output(tmp_path / "output.txt")
+    with output.journal(journal_file, checkpoint_interval=0) as journal:
+        journal.append(Result(word="кот", value=1))
+        assert output.path.read_text(encoding="utf-8") == "кот 1\n"
+        assert not journal_file.exists()
+    # Nothing changed since the last checkpoint.
+    assert output.saves == 1
+
+    with output.journal(journal_file) as journal:
+        assert journal.replay() == 0
+    assert output.saves == 1
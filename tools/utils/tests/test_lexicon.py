@@ -1,6 +1,23 @@
 import datetime
+import os
+from pathlib import Path
 
-from tools.utils.lexicon import lexicon_to_yaml, yaml_to_lexicon
+import pytest
+
+from tools.utils.defines import ASSERT_LEXICON_ROOT
+from tools.utils.lexicon import (
+    LexiconCache,
+    LexiconLoader,
+    StandardLexicon,
+    TabooLexicon,
+    compile_lexicon,
+    lexicon_to_yaml,
+    load_lexicon,
+    open_compiled_lexicon,
+    yaml_to_lexicon,
+)
+
+LOADERS: list[LexiconLoader] = ["pyyaml", "libyaml", "fast"]
 
 TEST_STANDARD_LEXICON = """\
 name: "Test words"
@@ -36,8 +53,9 @@ updated_at: 2001-12-23
 """
 
 
-def test_standard_lexicon():
-    lexicon = yaml_to_lexicon(TEST_STANDARD_LEXICON)
+@pytest.mark.parametrize("loader", LOADERS)
+def test_standard_lexicon(loader: LexiconLoader):
+    lexicon = yaml_to_lexicon(TEST_STANDARD_LEXICON, loader=loader)
     assert lexicon.name == "Test words"
     assert lexicon.language == "English"
     assert lexicon.updated_at == datetime.date(2001, 12, 23)
@@ -45,8 +63,9 @@ def test_standard_lexicon():
     assert lexicon_to_yaml(lexicon) == TEST_STANDARD_LEXICON
 
 
-def test_taboo_lexicon():
-    lexicon = yaml_to_lexicon(TEST_TABOO_LEXICON)
+@pytest.mark.parametrize("loader", LOADERS)
+def test_taboo_lexicon(loader: LexiconLoader):
+    lexicon = yaml_to_lexicon(TEST_TABOO_LEXICON, loader=loader)
     assert lexicon.name == "Test words"
     assert lexicon.language == "English"
     assert lexicon.updated_at == datetime.date(2001, 12, 23)
@@ -54,10 +73,197 @@ def test_taboo_lexicon():
     assert lexicon_to_yaml(lexicon) == TEST_TABOO_LEXICON
 
 
-def test_russian_lexicon():
-    lexicon = yaml_to_lexicon(TEST_RUSSIAN_LEXICON)
+@pytest.mark.parametrize("loader", LOADERS)
+def test_russian_lexicon(loader: LexiconLoader):
+    lexicon = yaml_to_lexicon(TEST_RUSSIAN_LEXICON, loader=loader)
     assert lexicon.name == "Тестовые слова"
     assert lexicon.language == "Russian"
     assert lexicon.updated_at == datetime.date(2001, 12, 23)
     assert lexicon.words == ["привет", "мир"]
     assert lexicon_to_yaml(lexicon) == TEST_RUSSIAN_LEXICON
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # Comments
+        TEST_STANDARD_LEXICON.replace('"world"', '"world" # ???'),
+        # Escape sequences
+        TEST_STANDARD_LEXICON.replace('"world"', '"wo\\u0072ld"'),
+        # Unquoted strings
+        TEST_TABOO_LEXICON.replace('"hello":', "hello:").replace('"hi"', "hi"),
+        # Explicit document start
+        "---\n" + TEST_RUSSIAN_LEXICON,
+        # No trailing newline
+        TEST_TABOO_LEXICON.rstrip("\n"),
+    ],
+)
+def test_fast_loader_fallback(content: str):
+    assert yaml_to_lexicon(content, loader="fast") == yaml_to_lexicon(
+        content, loader="pyyaml"
+    )
+
+
+@pytest.mark.parametrize(
+    "lexicon_path", sorted(ASSERT_LEXICON_ROOT.glob("*.yaml")), ids=lambda p: p.name
+)
+def test_fast_loader_on_app_lexicons(lexicon_path: Path):
+    content = lexicon_path.read_text(encoding="utf-8")
+    assert yaml_to_lexicon(content, loader="fast") == yaml_to_lexicon(
+        content, loader="libyaml"
+    )
+
+
+@pytest.mark.parametrize(
+    "lexicon_path", sorted(ASSERT_LEXICON_ROOT.glob("*.yaml")), ids=lambda p: p.name
+)
+def test_emitter_on_app_lexicons(lexicon_path: Path):
+    content = lexicon_path.read_text(encoding="utf-8")
+    assert lexicon_to_yaml(yaml_to_lexicon(content)) == content
+
+
+@pytest.mark.parametrize(
+    "word",
+    [
+        "",
+        'say "cheese"',
+        "back\\slash",
+        "tab\tand\nnewline",
+        "\ufeffbom",
+        "emoji 😀",
+        " ".join(["long"] * 30),
+    ],
+)
+def test_emitter_fallback(word: str):
+    standard_lexicon = yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert isinstance(standard_lexicon, StandardLexicon)
+    standard_lexicon.words.append(word)
+    assert yaml_to_lexicon(lexicon_to_yaml(standard_lexicon)) == standard_lexicon
+
+    taboo_lexicon = yaml_to_lexicon(TEST_TABOO_LEXICON)
+    assert isinstance(taboo_lexicon, TabooLexicon)
+    taboo_lexicon.words[word] = [word]
+    assert yaml_to_lexicon(lexicon_to_yaml(taboo_lexicon)) == taboo_lexicon
+
+
+@pytest.mark.parametrize(
+    "content", [TEST_STANDARD_LEXICON, TEST_TABOO_LEXICON, TEST_RUSSIAN_LEXICON]
+)
+def test_compiled_lexicon_roundtrip(content: str, tmp_path: Path):
+    lexicon = yaml_to_lexicon(content)
+    compile_lexicon(lexicon, tmp_path / "lexicon.lexbin")
+    with open_compiled_lexicon(tmp_path / "lexicon.lexbin") as compiled:
+        assert compiled.name == lexicon.name
+        assert compiled.kind == lexicon.kind
+        assert compiled.language == lexicon.language
+        assert compiled.updated_at == lexicon.updated_at
+        assert compiled.to_lexicon() == lexicon
+
+
+def test_compiled_lexicon_random_access(tmp_path: Path):
+    compile_lexicon(yaml_to_lexicon(TEST_TABOO_LEXICON), tmp_path / "taboo.lexbin")
+    with open_compiled_lexicon(tmp_path / "taboo.lexbin") as compiled:
+        assert len(compiled.words) == 2
+        assert compiled.words[1] == "world"
+        assert compiled.words[-2] == "hello"
+        assert list(compiled.words[1:]) == ["world"]
+        assert list(compiled.forbidden_words(0)) == ["hi", "bye"]
+        assert compiled.forbidden_words(0)[-1] == "bye"
+        assert list(compiled.forbidden_words(1)) == ["universe"]
+        with pytest.raises(IndexError):
+            compiled.words[2]
+        with pytest.raises(IndexError):
+            compiled.forbidden_words(2)
+
+
+@pytest.mark.parametrize(
+    "content", [TEST_STANDARD_LEXICON, TEST_TABOO_LEXICON, TEST_RUSSIAN_LEXICON]
+)
+def test_trusted_lexicon(content: str):
+    assert yaml_to_lexicon(content, trusted=True) == yaml_to_lexicon(content)
+
+
+def test_lazy_lexicon(tmp_path: Path):
+    lexicon_path = tmp_path / "lexicon.yaml"
+    lexicon_path.write_text(TEST_TABOO_LEXICON, encoding="utf-8")
+    lexicon = load_lexicon(lexicon_path, lazy=True)
+    assert lexicon.name == "Test words"
+    assert lexicon.kind == "taboo"
+    assert lexicon.updated_at == datetime.date(2001, 12, 23)
+    assert "words" not in lexicon.__dict__
+
+    # Words are read from the file on first access.
+    lexicon_path.write_text(
+        TEST_TABOO_LEXICON.replace('"universe"', '"galaxy"'), encoding="utf-8"
+    )
+    assert lexicon.words == {"hello": ["hi", "bye"], "world": ["galaxy"]}
+    assert lexicon == load_lexicon(lexicon_path)
+
+
+def test_lexicon_cache(tmp_path: Path):
+    cache = LexiconCache(tmp_path / "cache")
+    lexicon_path = tmp_path / "lexicon.yaml"
+    lexicon_path.write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert load_lexicon(lexicon_path, cache=cache, lazy=True).words == [
+        "hello",
+        "world",
+    ]
+
+    lexicon_path.write_text(TEST_RUSSIAN_LEXICON, encoding="utf-8")
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_RUSSIAN_LEXICON)
+
+    cache.invalidate(lexicon_path)
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_RUSSIAN_LEXICON)
+
+    # The entry of a file changed since it was cached is removed too.
+    lexicon_path.write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    cache.invalidate(lexicon_path)
+    assert not list(cache.root.glob("*.lexicon"))
+
+    cache.clear()
+    assert list(cache.root.iterdir()) == []
+
+
+def test_lexicon_cache_corrupt_entries(tmp_path: Path):
+    cache = LexiconCache(tmp_path / "cache")
+    lexicon_path = tmp_path / "lexicon.yaml"
+    lexicon_path.write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    cache.load(lexicon_path)
+    (data_entry,) = cache.root.glob("*.lexicon")
+    data_entry.write_bytes(data_entry.read_bytes()[:10])
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+
+
+def test_lexicon_cache_shared(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cache = LexiconCache(tmp_path / "cache", max_size_bytes=0)
+    cache.root.mkdir()
+    # Another process is writing an entry, which is not evicted.
+    other_tmp_entry = cache.root / "other.lexicon.1.tmp"
+    other_tmp_entry.write_bytes(b"x" * 100)
+    lexicon_path = tmp_path / "lexicon.yaml"
+    lexicon_path.write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert list(cache.root.iterdir()) == [other_tmp_entry]
+
+    # An entry that can't be written is not cached.
+    def replace(src: object, dst: object):
+        raise FileNotFoundError(src)
+
+    monkeypatch.setattr(os, "replace", replace)
+    cache = LexiconCache(tmp_path / "cache")
+    assert cache.load(lexicon_path) == yaml_to_lexicon(TEST_STANDARD_LEXICON)
+    assert list(cache.root.iterdir()) == [other_tmp_entry]
+
+
+def test_lexicon_cache_eviction(tmp_path: Path):
+    cache = LexiconCache(tmp_path / "cache", max_size_bytes=1000)
+    for i in range(10):
+        lexicon_path = tmp_path / f"lexicon{i}.yaml"
+        lexicon_path.write_text(
+            TEST_STANDARD_LEXICON.replace("world", f"world{i}"), encoding="utf-8"
+        )
+        cache.load(lexicon_path)
+    assert sum(entry.stat().st_size for entry in cache.root.iterdir()) <= 1000
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from tools.utils.lexicon_corpus import LexiconCorpus, WordOccurrence
+from tools.utils.tests.test_lexicon import (
+    TEST_RUSSIAN_LEXICON,
+    TEST_STANDARD_LEXICON,
+    TEST_TABOO_LEXICON,
+)
+
+# Also lists a headword as a forbidden word.
+TEST_CORPUS_TABOO_LEXICON = TEST_TABOO_LEXICON + '- "hello"\n'
+
+
+def make_corpus_root(tmp_path: Path) -> Path:
+    (tmp_path / "standard.yaml").write_text(TEST_STANDARD_LEXICON, encoding="utf-8")
+    (tmp_path / "taboo.yaml").write_text(TEST_CORPUS_TABOO_LEXICON, encoding="utf-8")
+    (tmp_path / "russian.yaml").write_text(TEST_RUSSIAN_LEXICON, encoding="utf-8")
+    return tmp_path
+
+
+def test_corpus_index(tmp_path: Path):
+    corpus = LexiconCorpus.load(make_corpus_root(tmp_path), max_workers=2)
+    assert sorted(corpus.lexicons) == ["russian", "standard", "taboo"]
+    assert sorted(corpus.occurrences("hello")) == [
+        WordOccurrence("standard", "standard", "headword", 0),
+        WordOccurrence("taboo", "taboo", "forbidden", 1),
+        WordOccurrence("taboo", "taboo", "headword", 0),
+    ]
+    assert corpus.occurrences("universe") == [
+        WordOccurrence("taboo", "taboo", "forbidden", 1)
+    ]
+    assert corpus.occurrences("missing") == []
+    assert sorted(corpus.lexicons_containing("hello")) == ["standard", "taboo"]
+    assert sorted(corpus.duplicate_headwords()) == ["hello", "world"]
+    assert corpus.words("Russian") == {"привет", "мир"}
+    assert corpus.words("English") == {"hello", "world", "hi", "bye", "universe"}
+    # Callers can't change the index.
+    assert isinstance(corpus.words("English"), frozenset)
+
+
+def test_corpus_language_filter(tmp_path: Path):
+    corpus = LexiconCorpus.load(make_corpus_root(tmp_path), languages={"Russian"})
+    assert list(corpus.lexicons) == ["russian"]
+    assert corpus.occurrences("hello") == []
@@ -1,9 +1,16 @@
 import locale
+import re
+import unicodedata
 
 import pytest
 
 from tools.utils.linguistics import (
+    clean_russian_words,
+    is_russian_word,
     remove_stresses,
+    ru_argsort,
+    ru_sort_key_ignore_case,
+    ru_sort_key_with_case,
     ru_sorted_ignore_case,
     ru_sorted_with_case,
 )
@@ -31,6 +38,52 @@ def test_remove_stresses():
     assert remove_stresses("ёж") == "ёж"
 
 
+# Per-word cleaning chain that `clean_russian_words` replaces.
+def reference_clean_word(word: str) -> list[str]:
+    cleaned_word = remove_stresses(word.replace("’", "'"))
+    subwords = [w.strip() for w in re.split(r"[,/]", cleaned_word) if w.strip()]
+    return [w for w in subwords if is_russian_word(w)]
+
+
+def test_clean_russian_words():
+    words = [
+        "ге́н",
+        "д’Артаньян",
+        "кот, кошка",
+        "кот/кошка",
+        "cat",
+        "кот, cat",
+        "2-й",
+        "-то",
+        "ёж",
+        "нью-йорк ",
+        "много слов",
+        "",
+        "кот\nкошка",
+        "ско́ро",
+    ]
+    result = clean_russian_words(words)
+    assert result.words == [w for word in words for w in reference_clean_word(word)]
+    assert result.rejected == [
+        ("cat", "latin"),
+        ("cat", "latin"),
+        ("2-й", "digits"),
+        ("-то", "edge_punctuation"),
+        ("много слов", "whitespace"),
+        ("кот\nкошка", "whitespace"),
+    ]
+    assert result.counts == {
+        "total": 14,
+        "stresses": 3,
+        "skipped": 6,
+        "compound": 2,
+        "rejected_latin": 2,
+        "rejected_digits": 1,
+        "rejected_edge_punctuation": 1,
+        "rejected_whitespace": 2,
+    }
+
+
 @pytest.mark.parametrize(
     ("letters", "sorted_letters"),
     [
@@ -116,3 +169,57 @@ def test_russian_words_sort():
         "жжё",
         "жжж",
     ]
+
+
+# Reference implementation: every character followed by a ё-marker.
+def reference_ru_sort_key(word: str) -> str:
+    def map_letter(ch: str) -> str:
+        if ch == "ё":
+            return "е1"
+        elif ch == "Ё":
+            return "Е1"
+        else:
+            return f"{ch}0"
+
+    return "".join([map_letter(ch) for ch in unicodedata.normalize("NFC", word)])
+
+
+TRICKY_WORDS = [
+    "е",
+    "ё",
+    "Ё",
+    "ее",
+    "еж",
+    "ёа",
+    "е\u0308ж",  # decomposed "ё"
+    "е😀",
+    "ё😀",
+    "еЖ",
+    "ЕЖ",
+    "е\nж",
+    "",
+    "Straße",
+    "STRASSE",
+    "ж",
+    "я",
+]
+
+
+def test_russian_sort_keys_match_reference():
+    assert sorted(TRICKY_WORDS, key=ru_sort_key_with_case) == sorted(
+        TRICKY_WORDS, key=reference_ru_sort_key
+    )
+    assert sorted(TRICKY_WORDS, key=ru_sort_key_ignore_case) == sorted(
+        TRICKY_WORDS, key=lambda w: reference_ru_sort_key(w.casefold())
+    )
+
+
+def test_russian_batch_sort_matches_key_sort():
+    assert ru_sorted_with_case(TRICKY_WORDS) == sorted(
+        TRICKY_WORDS, key=ru_sort_key_with_case
+    )
+    assert ru_sorted_ignore_case(TRICKY_WORDS) == sorted(
+        TRICKY_WORDS, key=ru_sort_key_ignore_case
+    )
+    assert ru_argsort(["в", "б", "ё", "а"], ignore_case=False) == [3, 1, 0, 2]
+    assert ru_sorted_with_case([]) == []
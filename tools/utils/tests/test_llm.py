@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+from pathlib import Path
+
+import pytest
+
+from tools.utils.llm import (
+    LlmCache,
+    LlmCacheStats,
+    SimpleLlmResponse,
+    llm_cache_key,
+    model_rate_limiter,
+)
+from tools.utils.rate_limit import RateLimiter
+
+
+def make_request(responses: list[str], text: str, cost_usd: float = 0.5):
+    async def request() -> SimpleLlmResponse:
+        await asyncio.sleep(0.01)
+        responses.append(text)
+        return SimpleLlmResponse(text=text, cost_usd=cost_usd)
+
+    return request
+
+
+def test_llm_cache_key():
+    key = llm_cache_key(
+        model="m", reasoning_effort="low", system_message="s", user_message="u"
+    )
+    assert key == llm_cache_key(
+        model="m", reasoning_effort="low", system_message="s", user_message="u"
+    )
+    assert key != llm_cache_key(
+        model="m", reasoning_effort=None, system_message="s", user_message="u"
+    )
+    assert key != llm_cache_key(
+        model="m", reasoning_effort="low", system_message="su", user_message=""
+    )
+
+
+def test_llm_cache(tmp_path: Path):
+    requested: list[str] = []
+    with LlmCache(tmp_path / "llm.sqlite") as cache:
+        response = asyncio.run(cache.get_or_request("a", make_request(requested, "A")))
+        assert response == SimpleLlmResponse(text="A", cost_usd=0.5)
+        response = asyncio.run(cache.get_or_request("a", make_request(requested, "B")))
+        assert response == SimpleLlmResponse(text="A", cost_usd=0.0)
+        assert requested == ["A"]
+        assert cache.stats == LlmCacheStats(hits=1, misses=1, cost_saved_usd=0.5)
+
+    with LlmCache(tmp_path / "llm.sqlite") as cache:
+        assert cache.get("a") == SimpleLlmResponse(text="A", cost_usd=0.5)
+        assert cache.get("b") is None
+
+    with LlmCache(tmp_path / "llm.sqlite", ttl=datetime.timedelta(0)) as cache:
+        assert cache.get("a") is None
+
+
+def test_llm_cache_single_flight(tmp_path: Path):
+    requested: list[str] = []
+
+    async def run(cache: LlmCache) -> list[SimpleLlmResponse]:
+        return list(
+            await asyncio.gather(
+                cache.get_or_request("a", make_request(requested, "A")),
+                cache.get_or_request("a", make_request(requested, "A2")),
+                cache.get_or_request("b", make_request(requested, "B")),
+            )
+        )
+
+    with LlmCache(tmp_path / "llm.sqlite") as cache:
+        assert asyncio.run(run(cache)) == [
+            SimpleLlmResponse(text="A", cost_usd=0.5),
+            SimpleLlmResponse(text="A", cost_usd=0.0),
+            SimpleLlmResponse(text="B", cost_usd=0.5),
+        ]
+        assert sorted(requested) == ["A", "B"]
+        assert cache.stats == LlmCacheStats(
+            hits=1, misses=2, deduplicated=1, cost_saved_usd=0.5
+        )
+
+
+def test_llm_cache_errors_are_not_cached(tmp_path: Path):
+    async def failing_request() -> SimpleLlmResponse:
+        raise RuntimeError("provider error")
+
+    async def run(cache: LlmCache):
+        return await asyncio.gather(
+            cache.get_or_request("a", failing_request),
+            cache.get_or_request("a", failing_request),
+            return_exceptions=True,
+        )
+
+    with LlmCache(tmp_path / "llm.sqlite") as cache:
+        assert all(isinstance(r, RuntimeError) for r in asyncio.run(run(cache)))
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_request("a", failing_request))
+        assert cache.get("a") is None
+
+
+def test_llm_cache_size_eviction(tmp_path: Path):
+    with LlmCache(tmp_path / "llm.sqlite", max_size_bytes=10) as cache:
+        cache.put("a", SimpleLlmResponse(text="1234", cost_usd=0.1))
+        cache.put("b", SimpleLlmResponse(text="1234", cost_usd=0.1))
+        assert cache.get("a") is not None
+        cache.put("c", SimpleLlmResponse(text="1234", cost_usd=0.1))
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        assert cache.get("c") is not None
+
+    # The running size doesn't count replaced responses twice.
+    with LlmCache(tmp_path / "llm2.sqlite", max_size_bytes=10) as cache:
+        cache.put("a", SimpleLlmResponse(text="1234", cost_usd=0.1))
+        cache.put("a", SimpleLlmResponse(text="4321", cost_usd=0.1))
+        cache.put("b", SimpleLlmResponse(text="1234", cost_usd=0.1))
+        assert cache.get("a") is not None
+
+
+def test_model_rate_limiter():
+    async def run() -> RateLimiter:
+        limiter = model_rate_limiter("gemini/gemini-2.5-pro")
+        assert limiter is model_rate_limiter("gemini/gemini-2.5-pro")
+        assert limiter is not model_rate_limiter("gpt-4o-mini")
+        assert limiter.requests is not None and limiter.tokens is not None
+        async with limiter.request(estimated_tokens=10) as request:
+            request.used_tokens = 20
+        return limiter
+
+    # Each event loop gets its own limiters.
+    assert asyncio.run(run()) is not asyncio.run(run())
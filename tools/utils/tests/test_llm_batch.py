@@ -0,0 +1,324 @@
+import asyncio
+import email.parser
+import email.policy
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+from openai import AsyncOpenAI
+
+from tools.utils.llm import LlmBatchBackend, LlmCache, simple_llm_request
+
+
+class FakeBatchApi:
+    """State of a local stand-in for an OpenAI-compatible batch API.
+
+    Jobs complete on the second poll. A request whose user message is "fail"
+    gets an error response, and "lost" gets no response at all. Like the real
+    API, a batch with several models fails.
+    """
+
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict[str, Any]] = {}
+        self.polls: dict[str, int] = {}
+        self.batch_sizes: list[int] = []
+        self.lock = threading.Lock()
+
+    def upload(self, content: bytes) -> dict[str, Any]:
+        with self.lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": 0,
+            "filename": "batch.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        }
+
+    def create_batch(self, input_file_id: str) -> dict[str, Any]:
+        with self.lock:
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": "/v1/chat/completions",
+                "input_file_id": input_file_id,
+                "completion_window": "24h",
+                "status": "validating",
+                "created_at": 0,
+            }
+            self.polls[batch_id] = 0
+        return self.batches[batch_id]
+
+    def retrieve_batch(self, batch_id: str) -> dict[str, Any]:
+        batch = self.batches[batch_id]
+        self.polls[batch_id] += 1
+        if self.polls[batch_id] == 1:
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress":
+            requests = [
+                json.loads(line)
+                for line in self.files[batch["input_file_id"]].splitlines()
+            ]
+            self.batch_sizes.append(len(requests))
+            if len({request["body"]["model"] for request in requests}) > 1:
+                batch["status"] = "failed"
+                batch["errors"] = {"data": [{"message": "Several models"}]}
+                return batch
+            output = self.upload(
+                b"".join(
+                    json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n"
+                    for request in requests
+                    if (response := self.respond(request)) is not None
+                )
+            )
+            batch["status"] = "completed"
+            batch["output_file_id"] = output["id"]
+        return batch
+
+    def respond(self, request: dict[str, Any]) -> dict[str, Any] | None:
+        body = request["body"]
+        user_message = body["messages"][-1]["content"]
+        if user_message == "lost":
+            return None
+        if user_message == "fail":
+            return {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 400,
+                    "body": {"error": {"message": "bad request"}},
+                },
+                "error": None,
+            }
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "id": "chatcmpl",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": (
+                                    f"{body['model']}/{body.get('reasoning_effort')}: "
+                                    f"{user_message.upper()}"
+                                ),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 1000,
+                        "completion_tokens": 100,
+                        "total_tokens": 1100,
+                    },
+                },
+            },
+            "error": None,
+        }
+
+
+def make_handler(api: FakeBatchApi) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match self.path.strip("/").split("/"):
+                case ["v1", "batches", batch_id]:
+                    self.reply(api.retrieve_batch(batch_id))
+                case ["v1", "files", file_id, "content"]:
+                    self.reply_bytes(api.files[file_id])
+                case _:
+                    self.send_error(404)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            match self.path.strip("/").split("/"):
+                case ["v1", "files"]:
+                    message = email.parser.BytesParser(
+                        policy=email.policy.default
+                    ).parsebytes(
+                        f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                        + body
+                    )
+                    parts = {
+                        part.get_param("name", header="content-disposition"): part
+                        for part in message.iter_parts()
+                    }
+                    content = parts["file"].get_payload(decode=True)
+                    assert isinstance(content, bytes)
+                    self.reply(api.upload(content))
+                case ["v1", "batches"]:
+                    self.reply(api.create_batch(json.loads(body)["input_file_id"]))
+                case _:
+                    self.send_error(404)
+
+        def reply(self, data: dict[str, Any]):
+            self.reply_bytes(json.dumps(data).encode("utf-8"), "application/json")
+
+        def reply_bytes(self, data: bytes, content_type: str = "text/plain"):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def batch_api() -> Iterator[tuple[FakeBatchApi, str]]:
+    api = FakeBatchApi()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(api))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield api, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+def make_backend(base_url: str, **kwargs: Any) -> LlmBatchBackend:
+    return LlmBatchBackend(
+        AsyncOpenAI(base_url=base_url, api_key="test", max_retries=0),
+        collect_delay=0.05,
+        poll_interval=0.01,
+        **kwargs,
+    )
+
+
+def test_llm_batch_backend(batch_api: tuple[FakeBatchApi, str]):
+    api, base_url = batch_api
+
+    async def run():
+        backend = make_backend(base_url)
+        return await asyncio.gather(
+            *(
+                simple_llm_request(
+                    model="openai/gpt-4o-mini",
+                    reasoning_effort="low",
+                    system_message="system",
+                    user_message=word,
+                    batch_backend=backend,
+                )
+                for word in ["кот", "fail", "пёс", "lost"]
+            ),
+            return_exceptions=True,
+        )
+
+    cat, failed, dog, lost = asyncio.run(run())
+    assert api.batch_sizes == [4]
+    assert not isinstance(cat, BaseException)
+    assert cat.text == "gpt-4o-mini/low: КОТ"
+    assert (cat.prompt_tokens, cat.completion_tokens) == (1000, 100)
+    # Batch prices of gpt-4o-mini are half of the regular ones.
+    assert cat.cost_usd == pytest.approx(1000 * 0.075e-6 + 100 * 0.3e-6)
+    assert not isinstance(dog, BaseException)
+    assert dog.text == "gpt-4o-mini/low: ПЁС"
+    assert isinstance(failed, RuntimeError)
+    assert "bad request" in str(failed)
+    assert isinstance(lost, RuntimeError)
+
+
+def test_llm_batch_backend_splits_batches(batch_api: tuple[FakeBatchApi, str]):
+    api, base_url = batch_api
+
+    async def run() -> list[str]:
+        backend = make_backend(base_url, max_batch_size=3)
+        responses = await asyncio.gather(
+            *(
+                backend.request(
+                    model="gpt-4o-mini",
+                    reasoning_effort=None,
+                    system_message="system",
+                    user_message=str(i),
+                )
+                for i in range(7)
+            )
+        )
+        # A request after the first batches have ended goes into a new one.
+        response = await backend.request(
+            model="gpt-4o-mini",
+            reasoning_effort=None,
+            system_message="system",
+            user_message="last",
+        )
+        return [r.text for r in [*responses, response]]
+
+    assert asyncio.run(run()) == [
+        *(f"gpt-4o-mini/None: {i}" for i in range(7)),
+        "gpt-4o-mini/None: LAST",
+    ]
+    assert api.batch_sizes == [3, 3, 1, 1]
+
+
+def test_llm_batch_backend_splits_models(batch_api: tuple[FakeBatchApi, str]):
+    api, base_url = batch_api
+
+    async def run() -> list[str]:
+        backend = make_backend(base_url)
+        responses = await asyncio.gather(
+            *(
+                backend.request(
+                    model=model,
+                    reasoning_effort=None,
+                    system_message="system",
+                    user_message="кот",
+                )
+                for model in ["gpt-4o-mini", "openai/gpt-4o", "gpt-4o-mini"]
+            )
+        )
+        return [r.text for r in responses]
+
+    assert asyncio.run(run()) == [
+        "gpt-4o-mini/None: КОТ",
+        "gpt-4o/None: КОТ",
+        "gpt-4o-mini/None: КОТ",
+    ]
+    assert sorted(api.batch_sizes) == [1, 2]
+
+
+def test_llm_batch_backend_checks_models():
+    with pytest.raises(ValueError, match="gemini"):
+        LlmBatchBackend(
+            AsyncOpenAI(api_key="test"),
+            models=["gpt-4o-mini", "gemini/gemini-2.5-pro"],
+        )
+
+
+def test_llm_batch_backend_with_cache(batch_api: tuple[FakeBatchApi, str], tmp_path):
+    api, base_url = batch_api
+
+    async def run(cache: LlmCache) -> list[float]:
+        backend = make_backend(base_url)
+        responses = await asyncio.gather(
+            *(
+                simple_llm_request(
+                    model="gpt-4o-mini",
+                    system_message="system",
+                    user_message=word,
+                    cache=cache,
+                    batch_backend=backend,
+                )
+                for word in ["кот", "кот", "пёс"]
+            )
+        )
+        return [r.cost_usd for r in responses]
+
+    with LlmCache(tmp_path / "llm.sqlite") as cache:
+        first_costs = asyncio.run(run(cache))
+        assert first_costs[0] > 0 and first_costs[1] == 0 and first_costs[2] > 0
+        assert asyncio.run(run(cache)) == [0, 0, 0]
+    assert api.batch_sizes == [2]
@@ -0,0 +1,133 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+
+import pytest
+from rich.console import Console
+
+from tools.utils.parallel_process import (
+    ProcessingCancelled,
+    ProcessingError,
+    ProcessingResult,
+    ProcessingSuccess,
+    parallel_process,
+    parallel_process_stream,
+)
+
+
+async def square(x: int) -> int:
+    # Later items finish first.
+    await asyncio.sleep(0.001 * (10 - x % 10))
+    if x == 13:
+        raise ValueError("unlucky")
+    return x * x
+
+
+def test_parallel_process():
+    done: list[int] = []
+    results = asyncio.run(
+        parallel_process(
+            list(range(20)),
+            square,
+            console=Console(),
+            max_parallel_requests=4,
+            on_success=done.append,
+        )
+    )
+    assert results[13] == ProcessingError(error="unlucky")
+    assert [r.value for r in results if isinstance(r, ProcessingSuccess)] == [
+        x * x for x in range(20) if x != 13
+    ]
+    assert sorted(done) == [x * x for x in range(20) if x != 13]
+    assert asyncio.run(parallel_process([], square, console=Console())) == []
+
+
+def test_parallel_process_stream():
+    async def numbers() -> AsyncIterator[int]:
+        for x in range(20):
+            yield x
+
+    async def run() -> list[tuple[int, ProcessingResult[int]]]:
+        return [
+            entry
+            async for entry in parallel_process_stream(numbers(), square, workers=4)
+        ]
+
+    results = asyncio.run(run())
+    # Results come as items complete.
+    assert [index for index, _ in results] != list(range(20))
+    assert sorted(index for index, _ in results) == list(range(20))
+    for index, result in results:
+        if index == 13:
+            assert isinstance(result, ProcessingError)
+        else:
+            assert result == ProcessingSuccess[int](value=index * index)
+
+
+def test_parallel_process_stream_backpressure():
+    produced = 0
+    in_flight = 0
+    max_in_flight = 0
+
+    def numbers() -> Iterator[int]:
+        nonlocal produced
+        for x in range(1_000_000):
+            produced += 1
+            yield x
+
+    async def process(x: int) -> int:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0)
+        in_flight -= 1
+        return x
+
+    async def run() -> list[int]:
+        indices: list[int] = []
+        async for index, _ in parallel_process_stream(numbers(), process, workers=4):
+            indices.append(index)
+            # Items are taken only as fast as the results are consumed.
+            assert produced <= len(indices) + 3 * 4
+            if len(indices) == 100:
+                break
+        return indices
+
+    assert len(asyncio.run(run())) == 100
+    assert max_in_flight == 4
+    assert produced < 200
+
+
+def test_parallel_process_stream_failing_iterator():
+    def numbers() -> Iterator[int]:
+        yield from range(5)
+        raise RuntimeError("broken input")
+
+    async def run() -> list[int]:
+        indices: list[int] = []
+        with pytest.raises(RuntimeError, match="broken input"):
+            async for index, _ in parallel_process_stream(numbers(), square, workers=2):
+                indices.append(index)
+        return indices
+
+    # The items taken before the error are processed.
+    assert sorted(asyncio.run(run())) == list(range(5))
+
+
+def test_parallel_process_interrupted():
+    async def run() -> list[ProcessingResult[int]]:
+        task = asyncio.create_task(
+            parallel_process(
+                list(range(10)), slow, console=Console(), max_parallel_requests=10
+            )
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return await task
+
+    async def slow(x: int) -> int:
+        await asyncio.sleep(0 if x < 5 else 10)
+        return x
+
+    results = asyncio.run(run())
+    assert results[:5] == [ProcessingSuccess[int](value=x) for x in range(5)]
+    assert results[5:] == [ProcessingCancelled()] * 5
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+
+from tools.utils.rate_limit import AimdConcurrency, RateLimiter, RateLimits, TokenBucket
+
+
+class ProviderOverloaded(Exception):
+    pass
+
+
+def test_token_bucket():
+    async def run() -> float:
+        # 100 tokens per second, 5 at once.
+        bucket = TokenBucket(6000, capacity=5)
+        start = time.monotonic()
+        for _ in range(15):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # The first 5 tokens are in the bucket, the other 10 take 0.1 seconds.
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+
+def test_token_bucket_debt():
+    async def run() -> float:
+        bucket = TokenBucket(6000, capacity=5)
+        # Larger than the bucket: waits for it to fill up and leaves a debt.
+        await bucket.acquire(15)
+        bucket.adjust(-5)
+        start = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - start
+
+    # 10 tokens of debt and 1 token take 0.11 seconds.
+    assert 0.09 <= asyncio.run(run()) < 0.5
+
+
+def test_aimd_concurrency():
+    async def run():
+        concurrency = AimdConcurrency(4, minimum=1, maximum=6)
+        # Successes with half of the limit used increase it by 1 / limit.
+        started = [await concurrency.acquire() for _ in range(4)]
+        for started_at in started:
+            await concurrency.release(started_at, "success")
+        assert concurrency.limit == pytest.approx(4.49, abs=0.01)
+        # Without the demand, the limit doesn't grow.
+        started_at = await concurrency.acquire()
+        await concurrency.release(started_at, "success")
+        assert concurrency.limit == pytest.approx(4.49, abs=0.01)
+
+        # Requests failing together decrease the limit once.
+        started = [await concurrency.acquire() for _ in range(4)]
+        for started_at in started:
+            await concurrency.release(started_at, "congestion")
+        assert concurrency.limit == pytest.approx(2.24, abs=0.01)
+        # A request started after the decrease decreases it again.
+        started_at = await concurrency.acquire()
+        await concurrency.release(started_at, "congestion")
+        assert concurrency.limit == pytest.approx(1.12, abs=0.01)
+        started_at = await concurrency.acquire()
+        await concurrency.release(started_at, "congestion")
+        assert concurrency.limit == 1
+        assert not concurrency.healthy
+
+    asyncio.run(run())
+
+
+def test_rate_limiter_finds_provider_limit():
+    # The provider rejects requests over its concurrency limit.
+    provider_limit = 8
+    in_flight = 0
+    max_in_flight = 0
+    rejected = 0
+
+    async def provider_request():
+        nonlocal in_flight, max_in_flight, rejected
+        if in_flight >= provider_limit:
+            rejected += 1
+            raise ProviderOverloaded
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        try:
+            await asyncio.sleep(0.002)
+        finally:
+            in_flight -= 1
+
+    async def run() -> float:
+        limiter = RateLimiter(
+            concurrency=AimdConcurrency(2, maximum=64),
+            is_congestion=lambda e: isinstance(e, ProviderOverloaded),
+        )
+
+        async def request():
+            while True:
+                try:
+                    async with limiter.request():
+                        return await provider_request()
+                except ProviderOverloaded:
+                    await asyncio.sleep(0.001)
+
+        await asyncio.gather(*(request() for _ in range(1000)))
+        return limiter.concurrency.limit
+
+    limit = asyncio.run(run())
+    assert max_in_flight == provider_limit
+    # A few rejections per probe above the limit, not one per request.
+    assert rejected < 100
+    assert provider_limit / 2 <= limit <= provider_limit + 2
+
+
+def test_rate_limiter_tokens():
+    async def run() -> float:
+        # 100 tokens per second, 10 at once.
+        limiter = RateLimiter(RateLimits(tokens_per_minute=6000))
+        assert limiter.tokens is not None and limiter.requests is None
+        limiter.tokens.capacity = 10
+        limiter.tokens.adjust(0)
+        async with limiter.request(estimated_tokens=5) as request:
+            request.used_tokens = 15
+        # The usage over the estimate is taken from the bucket.
+        start = time.monotonic()
+        async with limiter.request(estimated_tokens=1):
+            pass
+        return time.monotonic() - start
+
+    assert 0.04 <= asyncio.run(run()) < 0.5
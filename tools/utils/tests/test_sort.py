@@ -0,0 +1,31 @@
+import random
+
+import pytest
+
+from tools.utils.sort import iter_sorted_unique, sorted_unique
+
+
+def test_sorted_unique():
+    assert sorted_unique(["b", "A", "a", "c", "B"], key=str.casefold) == [
+        "A",
+        "b",
+        "c",
+    ]
+
+
+@pytest.mark.parametrize("max_run_size", [1, 3, 100, 1_000_000])
+def test_iter_sorted_unique(max_run_size: int):
+    rng = random.Random(42)
+    items = [rng.choice("abcdefgh") + rng.choice("abcABC") for _ in range(500)]
+    assert list(
+        iter_sorted_unique(items, key=str.casefold, max_run_size=max_run_size)
+    ) == sorted_unique(items, key=str.casefold)
+
+
+def test_iter_sorted_unique_is_lazy():
+    def items():
+        yield from ["c", "a", "b", "a"]
+
+    iterator = iter_sorted_unique(items(), key=lambda x: x, max_run_size=2)
+    assert next(iterator) == "a"
+    assert list(iterator) == ["b", "c"]
@@ -0,0 +1,327 @@
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+import yaml
+
+from tools.utils import yoficator
+from tools.utils.yaml import FlowListDumper
+from tools.utils.yoficator import (
+    YOFICATOR_SNAPSHOT_SUFFIX,
+    AmbiguousSpan,
+    CompactYofications,
+    E2yoKernelYofications,
+    LayeredYoficator,
+    LayerLookup,
+    ShardedYofications,
+    Yoficator,
+)
+
+
+def test_compact_yofications():
+    yofications = {
+        "еж": ["ёж"],
+        "все": ["все", "всё"],
+        "лес": ["лес"],
+        "Елка": ["Ёлка"],
+        "елочка": ["ёлочка", "елочка"],
+        "береза": ["берёза", "береза", "берёза"],
+        "неизвестно": ["???"],
+        "пусто": [],
+        "ещe": ["ещё"],  # Latin "e" can't be encoded as a key
+    }
+    compact = CompactYofications(yofications)
+    assert len(compact) == len(yofications)
+    assert dict(compact.items()) == yofications
+    for k, vs in yofications.items():
+        assert k in compact
+        assert compact[k] == vs
+    assert "ель" not in compact
+    assert "ещё" not in compact
+    assert 42 not in compact
+    with pytest.raises(KeyError):
+        compact["ель"]
+
+
+def test_compact_storage():
+    yoficator = Yoficator.from_e2yo_kernel()
+    compact_yoficator = Yoficator.from_e2yo_kernel(storage="compact")
+    assert isinstance(compact_yoficator.yofications, CompactYofications)
+    assert dict(compact_yoficator.yofications.items()) == yoficator.yofications
+    for word in ["елка", "Елка", "все", "лес", "ель"]:
+        assert compact_yoficator.contains(word) == yoficator.contains(word)
+        assert compact_yoficator(word) == yoficator(word)
+
+
+def test_snapshot(tmp_path: Path):
+    yoficator = Yoficator(
+        yofications={"еж": ["ёж"], "все": ["все", "всё"], "неизвестно": ["???"]}
+    )
+    path = tmp_path / f"test{YOFICATOR_SNAPSHOT_SUFFIX}"
+    yoficator.save_snapshot(path, source_digest="abc")
+    loaded = Yoficator.load_snapshot(path, source_digest="abc")
+    assert isinstance(loaded.yofications, CompactYofications)
+    assert dict(loaded.yofications.items()) == yoficator.yofications
+    assert loaded("все") == ["все", "всё"]
+    assert not loaded.contains("ель")
+
+    assert Yoficator.load_snapshot(path).yofications.keys() == {
+        "еж",
+        "все",
+        "неизвестно",
+    }
+    with pytest.raises(ValueError, match="outdated"):
+        Yoficator.load_snapshot(path, source_digest="def")
+    (tmp_path / "garbage").write_bytes(b"garbage")
+    with pytest.raises(ValueError, match="not a yoficator snapshot"):
+        Yoficator.load_snapshot(tmp_path / "garbage")
+
+
+def test_snapshot_storage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    safe_txt = tmp_path / "safe.txt"
+    not_safe_txt = tmp_path / "not_safe.txt"
+    safe_txt.write_text("ёж\nёлк(а|и)\n", encoding="utf-8")
+    not_safe_txt.write_text("всё\n", encoding="utf-8")
+    monkeypatch.setattr(yoficator, "E2YO_KERNEL_SAFE_TXT", safe_txt)
+    monkeypatch.setattr(yoficator, "E2YO_KERNEL_NOT_SAFE_TXT", not_safe_txt)
+    monkeypatch.setattr(yoficator, "SNAPSHOT_ROOT", tmp_path / "snapshots")
+    read_kernel_file = yoficator._read_e2yo_kernel_patterns
+    read_paths: list[Path] = []
+
+    def read_kernel_file_spy(path: Path):
+        read_paths.append(path)
+        return read_kernel_file(path)
+
+    monkeypatch.setattr(yoficator, "_read_e2yo_kernel_patterns", read_kernel_file_spy)
+
+    built = Yoficator.from_e2yo_kernel(storage="snapshot")
+    assert built("елки") == ["ёлки"]
+    assert len(read_paths) == 2
+    loaded = Yoficator.from_e2yo_kernel(storage="snapshot")
+    assert len(read_paths) == 2
+    assert dict(loaded.yofications.items()) == dict(built.yofications.items())
+
+    # The snapshot is rebuilt when a source changes
+    safe_txt.write_text("ёж\nёлк(а|и)\nлён\n", encoding="utf-8")
+    assert Yoficator.from_e2yo_kernel(storage="snapshot")("лен") == ["лён"]
+    assert len(read_paths) == 4
+    assert Yoficator.from_e2yo_kernel(storage="snapshot")("лен") == ["лён"]
+    assert len(read_paths) == 4
+
+
+def test_from_ru_wiktionary(tmp_path: Path):
+    path = tmp_path / "ru_wiktionary_word_forms.zip"
+    with ZipFile(path, "w") as z:
+        z.writestr(
+            "ru_wiktionary_word_forms.txt",
+            "\n".join(
+                [
+                    "все",
+                    "всё",
+                    "все",
+                    " ёлка ",
+                    "Ёлка",
+                    "Фёдор",
+                    "Берёзов",
+                    "Березов",
+                    "кот",
+                    "",
+                ]
+            ),
+        )
+    yoficator = Yoficator.from_ru_wiktionary(path)
+    assert yoficator.yofications == {
+        "все": ["все", "всё"],
+        "елка": ["ёлка"],
+        "Федор": ["Фёдор"],
+        "Березов": ["Березов", "Берёзов"],
+    }
+
+
+def test_yoficate_text():
+    yoficator = Yoficator(
+        yofications={
+            "еж": ["ёж"],
+            "все": ["всё", "все"],
+            "елка": ["ёлка"],
+            "Федор": ["Фёдор"],
+            "самолет": ["самолёт"],
+            "ковер": ["ковёр"],
+            "неизвестно": ["???"],
+        }
+    )
+    text = "Федор, ЕЖ и все елки. Елка-ковер-самолет? Неизвестно; ёж, еж\nзеленый"
+    result = yoficator.yoficate_text(text)
+    assert result.text == (
+        "Фёдор, ЁЖ и все елки. Елка-ковер-самолет? Неизвестно; ёж, ёж\nзеленый"
+    )
+    assert result.ambiguous_spans == [
+        AmbiguousSpan(12, 15, ["всё", "все"]),
+        AmbiguousSpan(22, 40, ["Ёлка-ковёр-самолёт", "Елка-ковер-самолет"]),
+    ]
+    for span in result.ambiguous_spans:
+        assert result.text[span.start : span.end] == text[span.start : span.end]
+
+    assert yoficator.yoficate_text("").text == ""
+    assert yoficator.yoficate_text("no Russian words").ambiguous_spans == []
+
+
+def test_e2yo_kernel_yofications(tmp_path: Path):
+    safe_txt = tmp_path / "safe.txt"
+    not_safe_txt = tmp_path / "not_safe.txt"
+    safe_txt.write_text(
+        "\n".join(
+            [
+                "ёлк(а|и|ой)",
+                "_берёзник(ам|ами)",
+                "Ёлкин(|а|у)",
+                "",
+                "ёлки",
+                "зелен(ёхонек|ёхонька)",
+                "вс(ё|е)",
+            ]
+        ),
+        encoding="utf-8",
+    )
+    not_safe_txt.write_text(
+        "\n".join(["всё# comment", "Грёз(|е)", "ёлка"]), encoding="utf-8"
+    )
+    kernel = E2yoKernelYofications.load(safe_txt, not_safe_txt)
+    expected = {
+        "елка": ["ёлка", "ёлка", "елка"],
+        "елки": ["ёлки"],
+        "елкой": ["ёлкой"],
+        "Елкин": ["Ёлкин"],
+        "Елкина": ["Ёлкина"],
+        "Елкину": ["Ёлкину"],
+        "зеленехонек": ["зеленёхонек"],
+        "зеленехонька": ["зеленёхонька"],
+        "все": ["всё", "все", "всё", "все"],
+        "Грез": ["Грёз", "Грез"],
+        "Грезе": ["Грёзе", "Грезе"],
+    }
+    assert kernel.to_dict() == expected
+    assert len(kernel) == len(expected)
+    assert set(kernel) == set(expected)
+    for key, yofications in expected.items():
+        assert kernel[key] == yofications
+    assert "березник" not in kernel
+    assert "ел" not in kernel
+    assert "елкаа" not in kernel
+
+    not_safe_txt.write_text("ёлка1\n", encoding="utf-8")
+    with pytest.raises(AssertionError, match="non-Russian"):
+        E2yoKernelYofications.load(safe_txt, not_safe_txt)
+
+
+def test_kernel_storage():
+    yoficator = Yoficator.from_e2yo_kernel()
+    kernel_yoficator = Yoficator.from_e2yo_kernel(storage="kernel")
+    assert isinstance(kernel_yoficator.yofications, E2yoKernelYofications)
+    assert len(kernel_yoficator.yofications) == len(yoficator.yofications)
+    for key, yofications in yoficator.yofications.items():
+        assert kernel_yoficator.yofications[key] == yofications
+
+
+def test_layered_yoficator():
+    loaded: list[str] = []
+
+    def loader(name: str, yofications: dict[str, list[str]]):
+        def load() -> Yoficator:
+            loaded.append(name)
+            return Yoficator(yofications=yofications)
+
+        return load
+
+    yoficator = LayeredYoficator(
+        [
+            ("reviewed", Yoficator(yofications={"все": ["все", "всё"]})),
+            ("kernel", loader("kernel", {"все": ["всё"], "елка": ["ёлка"]})),
+            ("full", loader("full", {"елка": ["елка"], "лес": ["лес"]})),
+        ]
+    )
+    assert yoficator.loaded_layers == []
+    assert yoficator.lookup("Все") == LayerLookup("reviewed", ["все", "всё"])
+    assert loaded == []
+    assert yoficator.loaded_layers == ["reviewed"]
+    assert yoficator.lookup("елка") == LayerLookup("kernel", ["ёлка"])
+    assert loaded == ["kernel"]
+    assert yoficator("лес") == ["лес"]
+    assert yoficator.lookup("ель") is None
+    assert yoficator("ель") == ["ель"]
+    assert not yoficator.contains("ель")
+    assert loaded == ["kernel", "full"]
+    assert yoficator.loaded_layers == ["reviewed", "kernel", "full"]
+
+
+def test_save_to_yofication_dictionary(tmp_path: Path):
+    yofications = {
+        "все": ["все", "всё"],
+        "еж": ["ёж"],
+        # Escaped by PyYAML outside the BMP.
+        "еж𝔸": ["ёж𝔸"],
+        "неизвестно": ["???"],
+        "пусто": [],
+        "": ["пусто"],
+        "с кавычкой": ['"'],
+        "с двоеточием": ["а: б"],
+        "е" * 80: ["ё" * 80],
+    }
+    path = tmp_path / "yofication_dictionary.yaml"
+    Yoficator(yofications=yofications).save_to_yofication_dictionary(path)
+    expected = {
+        k: sorted(["=" if v == k else v for v in vs])
+        for k, vs in sorted(yofications.items())
+    }
+    assert path.read_text(encoding="utf-8") == yaml.dump(
+        expected, allow_unicode=True, Dumper=FlowListDumper
+    )
+    assert Yoficator.from_yofication_dictionary(path).yofications == yofications
+
+    Yoficator(yofications={}).save_to_yofication_dictionary(path)
+    assert Yoficator.from_yofication_dictionary(path).yofications == {}
+
+
+def test_sharded_yofication_dictionary(tmp_path: Path):
+    yofications = {
+        "все": ["все", "всё"],
+        "Елка": ["Ёлка"],
+        "еж": ["ёж"],
+        "лес": ["лес"],
+        "-то": ["-то"],
+    }
+    root = tmp_path / "yofication_dictionary"
+    root.mkdir()
+    (root / "я.yaml").write_text('"ящер": ["ящер"]\n', encoding="utf-8")
+    Yoficator(yofications=yofications).save_to_yofication_dictionary(root, sharded=True)
+    assert sorted(p.name for p in root.iterdir()) == [
+        "_.yaml",
+        "в.yaml",
+        "е.yaml",
+        "л.yaml",
+    ]
+    assert (root / "е.yaml").read_text(encoding="utf-8") == (
+        '"Елка": ["Ёлка"]\n"еж": ["ёж"]\n'
+    )
+
+    yoficator = Yoficator.from_yofication_dictionary(root, storage="sharded")
+    assert isinstance(yoficator.yofications, ShardedYofications)
+    assert yoficator("Еж") == ["ёж"]
+    assert "ель" not in yoficator.yofications
+    assert "ящер" not in yoficator.yofications
+    assert yoficator.yofications.loaded_shards == ["е", "я"]
+    assert dict(yoficator.yofications) == yofications
+    assert Yoficator.from_yofication_dictionary(root).yofications == yofications
+
+    # Saving keeps the layout unless told otherwise.
+    yofications["ель"] = ["ель"]
+    Yoficator(yofications=yofications).save_to_yofication_dictionary(root)
+    assert (root / "е.yaml").read_text(encoding="utf-8").endswith('"ель": ["="]\n')
+    Yoficator(yofications=yofications).save_to_yofication_dictionary(
+        root, sharded=False
+    )
+    assert root.is_file()
+    assert Yoficator.from_yofication_dictionary(root).yofications == yofications
+    Yoficator(yofications=yofications).save_to_yofication_dictionary(root, sharded=True)
+    assert root.is_dir()
+    assert Yoficator.from_yofication_dictionary(root).yofications == yofications
@@ -1,96 +1,625 @@
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import multiprocessing
 import re
+import struct
+from array import array
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Literal, NamedTuple, TextIO
 from zipfile import ZipFile
 
 import yaml
 from pydantic import TypeAdapter
 
 from tools.utils.defines import (
+    CACHE_ROOT,
     E2YO_KERNEL_NOT_SAFE_TXT,
     E2YO_KERNEL_SAFE_TXT,
     RU_WIKTIONARY_WORD_FORMS_ZIP,
     YOFICATION_DICTIONARY_YAML,
 )
+from tools.utils.files import write_atomically
+from tools.utils.lexicon import file_digest
 from tools.utils.linguistics import (
     is_relaxed_russian_word,
-    is_russian_word,
     ru_sorted_ignore_case,
 )
 from tools.utils.yaml import FlowListDumper
 
 REMOVE_COMMENT_REGEXP = re.compile(r"#.*$")
 E2YO_MULTI_REGEXP = re.compile(r"^(.+)\((.*)\)$")
+# Russian words containing "е", possibly joined by hyphens or apostrophes.
+TEXT_WORD_WITH_E_REGEXP = re.compile(
+    r"(?<![а-яёА-ЯЁ])(?:[а-яёА-ЯЁ]+['-])*[а-яёА-ЯЁ]*[еЕ][а-яёА-ЯЁ]*(?:['-][а-яёА-ЯЁ]+)*"
+)
+
+# - "dict": plain `dict[str, list[str]]`, can be modified;
+# - "compact": read-only `CompactYofications`;
+# - "snapshot": `CompactYofications` memory-mapped from a snapshot in
+#   `SNAPSHOT_ROOT`, which is rebuilt when source files change;
+# - "kernel": `E2yoKernelYofications`, only for the e2yo kernel;
+# - "sharded": `ShardedYofications`, only for a sharded yofication dictionary.
+YoficationStorage = Literal["dict", "compact", "snapshot", "kernel", "sharded"]
+
+SNAPSHOT_ROOT = CACHE_ROOT / "yoficator"
+YOFICATOR_SNAPSHOT_SUFFIX = ".yosnap"
+
+_KEY_ENCODING = "cp1251"
+_LIBYAML_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+# Characters that PyYAML writes double-quoted without escapes: word characters
+# in the BMP (PyYAML escapes the others) and a few punctuation marks.
+_PLAIN_CHARS = r"(?:[^\W\U00010000-\U0010ffff]|[ '=?-])"
+# Strings that PyYAML writes double-quoted without escapes.
+_PLAIN_DOUBLE_QUOTED_REGEXP = re.compile(rf"{_PLAIN_CHARS}*")
+_YAML_LINE_WIDTH = 80
+# A line written by `_write_yofication_dictionary_yaml` without PyYAML.
+_PLAIN_YOFICATION_LINE_REGEXP = re.compile(
+    rf'"({_PLAIN_CHARS}+)": \[((?:"{_PLAIN_CHARS}*"(?:, "{_PLAIN_CHARS}*")*)?)\]'
+)
+_SHARD_SUFFIX = ".yaml"
+# Shard of keys that don't start with a letter.
+_OTHER_SHARD = "_"
+_RUSSIAN_LETTERS = frozenset(
+    "абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ"
+)
+_RUSSIAN_WORD_CHARS_REGEXP = re.compile(r"^[а-яёА-ЯЁ'-]*$")
+_SNAPSHOT_MAGIC = b"HATYO\x00\x00\x01"
+# Magic, number of keys, metadata size, keys size, values size.
+_SNAPSHOT_HEADER = struct.Struct("<8sIIII")
 
 
 def deyoficate(word: str) -> str:
     return word.replace("ё", "е").replace("Ё", "Е")
 
 
-class Yoficator:
-    def __init__(self, yofications: dict[str, list[str]]):
-        self.yofications = yofications
+@dataclass
+class AmbiguousSpan:
+    start: int
+    end: int
+    # Possible spellings, with the original capitalization.
+    options: list[str]
+
+
+@dataclass
+class TextYofication:
+    # Text with unambiguous words yoficated. Ambiguous words are left as is,
+    # so positions in the text are the same as in the original.
+    text: str
+    ambiguous_spans: list[AmbiguousSpan]
+
+
+class CompactYofications(Mapping[str, list[str]]):
+    """Read-only yofications packed into flat byte strings.
+
+    Keys are encoded in cp1251 (a byte per letter), sorted and concatenated.
+    Yofications almost always differ from their key only in "е" -> "ё", so
+    each one is stored as the positions of "ё", a byte or two per word.
+    Offsets into both byte strings are kept in `array`s, and the rare entries
+    that don't fit this scheme go to a plain dict. This takes an order of
+    magnitude less memory than a `dict` of `list`s, and lookups are a binary
+    search over the keys.
+    """
+
+    _keys: bytes | mmap.mmap
+    _values: bytes | mmap.mmap
+    _key_offsets: Sequence[int]
+    _value_offsets: Sequence[int]
+    _extra: dict[str, list[str]]
+
+    def __init__(self, yofications: Mapping[str, list[str]]):
+        self._extra = {}
+        # Each entry is the encoded key and yofications joined by a zero byte,
+        # so sorting entries sorts keys and they take a single object each.
+        entries: list[bytes] = []
+        for k, vs in yofications.items():
+            try:
+                if "\0" in k:
+                    raise ValueError("zero character in the key")
+                entries.append(
+                    k.encode(_KEY_ENCODING) + b"\0" + _encode_yofications(k, vs)
+                )
+            except (UnicodeEncodeError, ValueError):
+                self._extra[k] = vs
+        entries.sort()
+        keys = bytearray()
+        values = bytearray()
+        self._key_offsets = array("I", [0])
+        self._value_offsets = array("I", [0])
+        for entry in entries:
+            key, _, value = entry.partition(b"\0")
+            keys += key
+            values += value
+            self._key_offsets.append(len(keys))
+            self._value_offsets.append(len(values))
+        self._keys = bytes(keys)
+        self._values = bytes(values)
+
+    def __len__(self) -> int:
+        return len(self._key_offsets) - 1 + len(self._extra)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self._key_offsets) - 1):
+            yield self._key(i).decode(_KEY_ENCODING)
+        yield from self._extra
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, str):
+            return False
+        try:
+            if self._find(key.encode(_KEY_ENCODING)) >= 0:
+                return True
+        except UnicodeEncodeError:
+            pass
+        return key in self._extra
+
+    def __getitem__(self, key: str) -> list[str]:
+        try:
+            i = self._find(key.encode(_KEY_ENCODING))
+        except UnicodeEncodeError:
+            return self._extra[key]
+        if i < 0:
+            return self._extra[key]
+        value = self._values[self._value_offsets[i] : self._value_offsets[i + 1]]
+        return [_decode_yofication(key, positions) for positions in value.split(b"\0")]
+
+    def _key(self, i: int) -> bytes:
+        return self._keys[self._key_offsets[i] : self._key_offsets[i + 1]]
+
+    def _find(self, key: bytes) -> int:
+        keys, offsets = self._keys, self._key_offsets
+        lo, hi = 0, len(offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[offsets[mid] : offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(offsets) - 1 and keys[offsets[lo] : offsets[lo + 1]] == key:
+            return lo
+        return -1
+
+
+# Encodes each yofication as bytes `position + 1` of its "ё" letters, separated
+# by zero bytes. Raises ValueError if a yofication is not the key with some "е"
+# replaced by "ё".
+def _encode_yofications(key: str, yofications: list[str]) -> bytes:
+    if not yofications:
+        raise ValueError("no yofications")
+    encoded: list[bytes] = []
+    for y in yofications:
+        if y == key:
+            encoded.append(b"")
+            continue
+        if len(y) != len(key) or len(key) >= 255 or deyoficate(y) != key:
+            raise ValueError(f'"{y}" is not a yofication of "{key}"')
+        encoded.append(bytes(i + 1 for i, ch in enumerate(y) if ch in "ёЁ"))
+    return b"\0".join(encoded)
+
+
+def _decode_yofication(key: str, positions: bytes) -> str:
+    if not positions:
+        return key
+    letters = list(key)
+    for p in positions:
+        letters[p - 1] = "ё" if letters[p - 1] == "е" else "Ё"
+    return "".join(letters)
+
+
+# Snapshot layout: header, JSON metadata padded to 4 bytes, key offsets, value
+# offsets, keys, values. Offsets are absolute file positions, so a mapped
+# snapshot is used as is.
+def _write_snapshot(yofications: CompactYofications, path: Path, source_digest: str):
+    metadata = json.dumps(
+        {"source_digest": source_digest, "extra": yofications._extra},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    metadata += b" " * (-len(metadata) % 4)
+    num_keys = len(yofications._key_offsets) - 1
+    keys_start = _SNAPSHOT_HEADER.size + len(metadata) + 2 * (num_keys + 1) * 4
+    values_start = keys_start + len(yofications._keys)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write atomically: the snapshot may be mapped by other processes.
+    with write_atomically(path, "wb") as f:
+        f.write(
+            _SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_MAGIC,
+                num_keys,
+                len(metadata),
+                len(yofications._keys),
+                len(yofications._values),
+            )
+        )
+        f.write(metadata)
+        f.write(array("I", (keys_start + o for o in yofications._key_offsets)))
+        f.write(array("I", (values_start + o for o in yofications._value_offsets)))
+        f.write(yofications._keys)
+        f.write(yofications._values)
+
+
+def _open_snapshot(path: Path) -> tuple[CompactYofications, str]:
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) < _SNAPSHOT_HEADER.size:
+        raise ValueError(f"{path} is not a yoficator snapshot")
+    magic, num_keys, metadata_size, keys_size, values_size = (
+        _SNAPSHOT_HEADER.unpack_from(data, 0)
+    )
+    offsets_start = _SNAPSHOT_HEADER.size + metadata_size
+    offsets_size = (num_keys + 1) * 4
+    if (
+        magic != _SNAPSHOT_MAGIC
+        or len(data) != offsets_start + 2 * offsets_size + keys_size + values_size
+    ):
+        raise ValueError(f"{path} is not a yoficator snapshot")
+    metadata = json.loads(data[_SNAPSHOT_HEADER.size : offsets_start])
+    offsets = memoryview(data)[offsets_start : offsets_start + 2 * offsets_size]
+    yofications = CompactYofications.__new__(CompactYofications)
+    yofications._keys = data
+    yofications._values = data
+    yofications._key_offsets = offsets[:offsets_size].cast("I")
+    yofications._value_offsets = offsets[offsets_size:].cast("I")
+    yofications._extra = metadata["extra"]
+    return yofications, metadata["source_digest"]
+
+
+def _sources_digest(sources: list[Path]) -> str:
+    digest = hashlib.blake2b()
+    for source in sources:
+        digest.update(file_digest(source).encode("ascii"))
+    return digest.hexdigest()
+
+
+class _KernelSuffixes(NamedTuple):
+    suffixes: tuple[str, ...]
+    # Deyoficated suffix -> positions in `suffixes`.
+    positions: dict[str, list[int]]
+    # Parts of the `is_russian_word` check that don't depend on the base:
+    # - all characters are allowed and non-empty suffixes end with a letter;
+    # - all suffixes start with a letter;
+    # - one of the suffixes is empty.
+    russian_chars_and_ends: bool
+    russian_starts: bool
+    has_empty: bool
+
+
+# Line number, base and suffixes of a kernel line "base(suffix|...)". Lines
+# with the same suffixes share one `_KernelSuffixes`.
+_KernelPattern = tuple[int, str, _KernelSuffixes]
+
+
+class _KernelPatterns(NamedTuple):
+    # Deyoficated base -> patterns with this base.
+    by_base: dict[str, list[_KernelPattern]]
+    max_suffix_length: int
+
+
+class E2yoKernelYofications(Mapping[str, list[str]]):
+    """Read-only yofications of the e2yo kernel kept in its compressed form.
+
+    Kernel lines are "base(suffix1|suffix2|...)" patterns, indexed by the
+    deyoficated base. A key is looked up by splitting it at every position
+    that leaves a suffix not longer than the longest one in the kernel.
+    Values are the same as in the expanded dictionary: words from the safe
+    kernel in file order, then for each word from the non-safe kernel the word
+    and its deyoficated form.
+    """
+
+    def __init__(self, safe: _KernelPatterns, not_safe: _KernelPatterns):
+        self._safe = safe
+        self._not_safe = not_safe
+        self._len: int | None = None
 
     @classmethod
-    def from_e2yo_kernel(cls) -> "Yoficator":
-        safe_words = set(_read_y2yo_kernel_file(E2YO_KERNEL_SAFE_TXT))
-        non_safe_words = set(_read_y2yo_kernel_file(E2YO_KERNEL_NOT_SAFE_TXT))
+    def load(cls, safe_path: Path, not_safe_path: Path) -> "E2yoKernelYofications":
+        return cls(
+            _read_e2yo_kernel_patterns(safe_path),
+            _read_e2yo_kernel_patterns(not_safe_path),
+        )
+
+    def __len__(self) -> int:
+        if self._len is None:
+            self._len = sum(1 for _ in self)
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        seen: set[str] = set()
+        for w in itertools.chain(
+            _kernel_words(self._safe), _kernel_words(self._not_safe)
+        ):
+            key = deyoficate(w)
+            if key not in seen:
+                seen.add(key)
+                yield key
+
+    def __getitem__(self, key: str) -> list[str]:
+        yofications = _find_kernel_words(self._safe, key)
+        for w in _find_kernel_words(self._not_safe, key):
+            yofications.extend([w, deyoficate(w)])
+        if not yofications:
+            raise KeyError(key)
+        return yofications
+
+    # Expands the kernel into a dict, faster than looking up every key.
+    def to_dict(self) -> dict[str, list[str]]:
         yofications: dict[str, list[str]] = {}
-        for w in safe_words:
-            assert is_russian_word(w), f'"{w}" is not a Russian word'
+        for w in dict.fromkeys(_kernel_words(self._safe)):
             yofications.setdefault(deyoficate(w), []).append(w)
-        for w in non_safe_words:
-            assert is_russian_word(w), f'"{w}" is not a Russian word'
+        for w in dict.fromkeys(_kernel_words(self._not_safe)):
             yofications.setdefault(deyoficate(w), []).extend([w, deyoficate(w)])
+        return yofications
+
+
+# Words matching `key` in file order, without duplicates.
+def _find_kernel_words(patterns: _KernelPatterns, key: str) -> list[str]:
+    found: list[tuple[int, int, str]] = []
+    for i in range(max(0, len(key) - patterns.max_suffix_length), len(key) + 1):
+        for line_number, base, suffixes in patterns.by_base.get(key[:i], ()):
+            for position in suffixes.positions.get(key[i:], ()):
+                found.append(
+                    (line_number, position, base + suffixes.suffixes[position])
+                )
+    if len(found) > 1:
+        found.sort()
+    return list(dict.fromkeys(w for _, _, w in found))
+
+
+def _kernel_words(patterns: _KernelPatterns) -> Iterator[str]:
+    all_patterns = sorted(itertools.chain.from_iterable(patterns.by_base.values()))
+    for _, base, suffixes in all_patterns:
+        for suffix in suffixes.suffixes:
+            yield base + suffix
+
+
+class ShardedYofications(Mapping[str, list[str]]):
+    """Read-only yofications of a sharded yofication dictionary.
+
+    The dictionary is a directory with a YAML file per initial letter of the
+    lowercased keys. A lookup loads only the shard of its key; iterating loads
+    all shards that are not loaded yet, in parallel.
+    """
+
+    def __init__(self, root: Path, *, max_workers: int | None = None):
+        self.root = root
+        self.max_workers = max_workers
+        self._shards: dict[str, dict[str, list[str]]] = {}
+
+    @property
+    def loaded_shards(self) -> list[str]:
+        return sorted(self._shards)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._all_shards().values())
+
+    def __iter__(self) -> Iterator[str]:
+        for _, shard in sorted(self._all_shards().items()):
+            yield from shard
+
+    def __getitem__(self, key: str) -> list[str]:
+        return self._shard(_yofication_shard(key))[key]
+
+    def _shard(self, name: str) -> dict[str, list[str]]:
+        shard = self._shards.get(name)
+        if shard is None:
+            path = self.root / f"{name}{_SHARD_SUFFIX}"
+            shard = self._shards[name] = (
+                _load_yofication_shard(path) if path.exists() else {}
+            )
+        return shard
+
+    def _all_shards(self) -> dict[str, dict[str, list[str]]]:
+        names = [
+            path.stem
+            for path in sorted(self.root.glob(f"*{_SHARD_SUFFIX}"))
+            if path.stem not in self._shards
+        ]
+        if len(names) > 1:
+            # Not forked: the caller may have threads, e.g. tqdm's monitor.
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            ) as executor:
+                shards = executor.map(
+                    _load_yofication_shard,
+                    [self.root / f"{name}{_SHARD_SUFFIX}" for name in names],
+                )
+                self._shards.update(zip(names, shards, strict=True))
+        else:
+            for name in names:
+                self._shard(name)
+        return self._shards
+
+
+def _yofication_shard(key: str) -> str:
+    initial = key[:1].lower()
+    return initial if initial.isalpha() else _OTHER_SHARD
+
+
+def _load_yofication_shard(path: Path) -> dict[str, list[str]]:
+    return {
+        k: sorted([k if v == "=" else v for v in vs])
+        for k, vs in _read_yofication_dictionary_yaml(
+            path.read_text(encoding="utf-8")
+        ).items()
+    }
+
+
+class Yoficator:
+    def __init__(self, yofications: Mapping[str, list[str]]):
+        self.yofications = yofications
+
+    @classmethod
+    def _with_storage(
+        cls, yofications: dict[str, list[str]], storage: YoficationStorage
+    ) -> "Yoficator":
+        assert storage != "kernel", "Only the e2yo kernel has kernel storage"
+        assert storage != "sharded", "Only a yofication dictionary can be sharded"
+        if storage != "dict":
+            return cls(yofications=CompactYofications(yofications))
         return cls(yofications=yofications)
 
     @classmethod
-    def from_yofication_dictionary(cls) -> "Yoficator":
-        yofications = TypeAdapter(dict[str, list[str]]).validate_python(
-            yaml.safe_load(YOFICATION_DICTIONARY_YAML.read_text(encoding="utf-8"))
-        )
-        return cls(
-            yofications={
-                k: sorted([k if v == "=" else v for v in vs])
-                for k, vs in yofications.items()
-            }
+    def _from_snapshot(
+        cls, name: str, sources: list[Path], build: Callable[[], "Yoficator"]
+    ) -> "Yoficator":
+        path = SNAPSHOT_ROOT / f"{name}{YOFICATOR_SNAPSHOT_SUFFIX}"
+        source_digest = _sources_digest(sources)
+        try:
+            return cls.load_snapshot(path, source_digest=source_digest)
+        except (FileNotFoundError, ValueError):
+            pass
+        yoficator = build()
+        yoficator.save_snapshot(path, source_digest=source_digest)
+        return yoficator
+
+    # Raises ValueError if the file is not a snapshot, or if `source_digest` is
+    # given and doesn't match the one the snapshot was saved with.
+    @classmethod
+    def load_snapshot(
+        cls, path: Path, *, source_digest: str | None = None
+    ) -> "Yoficator":
+        yofications, snapshot_source_digest = _open_snapshot(path)
+        if source_digest is not None and source_digest != snapshot_source_digest:
+            raise ValueError(f"{path} is outdated")
+        return cls(yofications=yofications)
+
+    def save_snapshot(self, path: Path, *, source_digest: str = ""):
+        yofications = self.yofications
+        if not isinstance(yofications, CompactYofications):
+            yofications = CompactYofications(yofications)
+        _write_snapshot(yofications, path, source_digest)
+
+    @classmethod
+    def from_e2yo_kernel(cls, *, storage: YoficationStorage = "dict") -> "Yoficator":
+        assert storage != "sharded", "Only a yofication dictionary can be sharded"
+        if storage == "snapshot":
+            return cls._from_snapshot(
+                "e2yo_kernel",
+                [E2YO_KERNEL_SAFE_TXT, E2YO_KERNEL_NOT_SAFE_TXT],
+                lambda: cls.from_e2yo_kernel(storage="compact"),
+            )
+        kernel = E2yoKernelYofications.load(
+            E2YO_KERNEL_SAFE_TXT, E2YO_KERNEL_NOT_SAFE_TXT
         )
+        match storage:
+            case "dict":
+                return cls(yofications=kernel.to_dict())
+            case "kernel":
+                return cls(yofications=kernel)
+            case "compact":
+                return cls(yofications=CompactYofications(kernel.to_dict()))
 
     @classmethod
-    def from_ru_wiktionary(cls) -> "Yoficator":
-        with ZipFile(RU_WIKTIONARY_WORD_FORMS_ZIP) as z:
-            lines = z.read("ru_wiktionary_word_forms.txt").decode("utf-8").split("\n")
-            words = set(w.strip() for w in lines if w.strip())
+    def from_yofication_dictionary(
+        cls,
+        path: Path = YOFICATION_DICTIONARY_YAML,
+        *,
+        storage: YoficationStorage = "dict",
+    ) -> "Yoficator":
+        sharded = path.is_dir()
+        assert sharded or storage != "sharded", f"{path} is not sharded"
+        if storage == "snapshot":
+            return cls._from_snapshot(
+                "yofication_dictionary",
+                sorted(path.glob(f"*{_SHARD_SUFFIX}")) if sharded else [path],
+                lambda: cls.from_yofication_dictionary(path, storage="compact"),
+            )
+        if sharded:
+            yofications = ShardedYofications(path)
+            if storage == "sharded":
+                return cls(yofications=yofications)
+            return cls._with_storage(dict(yofications), storage)
+        return cls._with_storage(_load_yofication_shard(path), storage)
 
+    @classmethod
+    def from_ru_wiktionary(
+        cls,
+        path: Path = RU_WIKTIONARY_WORD_FORMS_ZIP,
+        *,
+        storage: YoficationStorage = "dict",
+    ) -> "Yoficator":
+        if storage == "snapshot":
+            return cls._from_snapshot(
+                "ru_wiktionary",
+                [path],
+                lambda: cls.from_ru_wiktionary(path, storage="compact"),
+            )
+        # Streams the file, so only words with “е” or “ё” are kept in memory.
         yofications: dict[str, list[str]] = {}
-        for w in words:
-            w_lower = w.lower()
-            # Note: we store words with “е” not because it's useful for
-            # yofication, but because when we save the yofication dictionary it
-            # shows that we've processed this word and confirmed that it
-            # shouldn't be yoficated.
-            if "е" in w_lower or "ё" in w_lower:
-                yofications.setdefault(deyoficate(w), []).append(w)
+        capitalized_keys: set[str] = set()
+        with (
+            ZipFile(path) as z,
+            z.open("ru_wiktionary_word_forms.txt") as f,
+        ):
+            for line in io.TextIOWrapper(f, encoding="utf-8"):
+                w = line.strip()
+                w_lower = w.lower()
+                # Note: we store words with “е” not because it's useful for
+                # yofication, but because when we save the yofication dictionary
+                # it shows that we've processed this word and confirmed that it
+                # shouldn't be yoficated.
+                if "е" in w_lower or "ё" in w_lower:
+                    key = deyoficate(w)
+                    ys = yofications.setdefault(key, [])
+                    if w not in ys:
+                        ys.append(w)
+                    if w != w_lower:
+                        capitalized_keys.add(key)
+
+        # Filter out capitalized versions of common nouns
+        for key in capitalized_keys:
+            common_ys = yofications.get(key.lower(), ())
+            ys = [y for y in yofications[key] if y.lower() not in common_ys]
+            if ys:
+                yofications[key] = ys
+            else:
+                del yofications[key]
+        del capitalized_keys
 
         for ys in yofications.values():
-            ys_lower = [y.lower() for y in ys]
-            ys[:] = [
-                y
-                for y in ru_sorted_ignore_case(ys)
-                # filter out capitalized version of common nouns
-                if y == y.lower() or y.lower() not in ys_lower
-            ]
+            if len(ys) > 1:
+                ys[:] = ru_sorted_ignore_case(ys)
 
-        return cls(yofications=yofications)
+        return cls._with_storage(yofications, storage)
 
-    def save_to_yofication_dictionary(self):
+    # With `sharded=True`, `path` is a directory with a file per shard, and
+    # files of shards that became empty are removed.
+    # Keeps the current layout of `path` unless `sharded` is given, in which
+    # case a dictionary in the other layout is converted.
+    def save_to_yofication_dictionary(
+        self, path: Path = YOFICATION_DICTIONARY_YAML, *, sharded: bool | None = None
+    ):
+        if sharded is None:
+            sharded = path.is_dir()
         yofications = {
             k: sorted(["=" if v == k else v for v in vs])
             for k, vs in sorted(self.yofications.items())
         }
-        YOFICATION_DICTIONARY_YAML.write_text(
-            yaml.dump(yofications, allow_unicode=True, Dumper=FlowListDumper),
-            encoding="utf-8",
-        )
+        if not sharded:
+            if path.is_dir():
+                for shard_path in path.glob(f"*{_SHARD_SUFFIX}"):
+                    shard_path.unlink()
+                path.rmdir()
+            with write_atomically(path) as f:
+                _write_yofication_dictionary_yaml(yofications, f)
+            return
+        shards: dict[str, dict[str, list[str]]] = {}
+        for k, vs in yofications.items():
+            shards.setdefault(_yofication_shard(k), {})[k] = vs
+        if path.is_file():
+            path.unlink()
+        path.mkdir(parents=True, exist_ok=True)
+        for shard_path in path.glob(f"*{_SHARD_SUFFIX}"):
+            if shard_path.stem not in shards:
+                shard_path.unlink()
+        for name, shard in shards.items():
+            with write_atomically(path / f"{name}{_SHARD_SUFFIX}") as f:
+                _write_yofication_dictionary_yaml(shard, f)
 
     def contains(self, word: str) -> bool:
         assert is_relaxed_russian_word(word), f'"{word}" is not a Russian word'
@@ -100,24 +629,228 @@ class Yoficator:
         assert is_relaxed_russian_word(word), f'"{word}" is not a Russian word'
         return self.yofications.get(word.lower(), [word])
 
+    # Yoficates all words of `text` in one pass. Words are looked up as is and
+    # then lowercased, and each distinct word is resolved only once.
+    def yoficate_text(self, text: str) -> TextYofication:
+        resolved: dict[str, list[str]] = {}
+        ambiguous_spans: list[AmbiguousSpan] = []
+
+        def replace(match: re.Match[str]) -> str:
+            word = match.group()
+            options = resolved.get(word)
+            if options is None:
+                options = resolved[word] = self._yoficate_text_word(word)
+            if len(options) == 1:
+                return options[0]
+            ambiguous_spans.append(AmbiguousSpan(match.start(), match.end(), options))
+            return word
+
+        return TextYofication(
+            text=TEXT_WORD_WITH_E_REGEXP.sub(replace, text),
+            ambiguous_spans=ambiguous_spans,
+        )
+
+    def _yoficate_text_word(self, word: str) -> list[str]:
+        options = self._text_word_options(word)
+        if options is None and "-" in word:
+            part_options = [
+                self._text_word_options(part) or [part] for part in word.split("-")
+            ]
+            options = ["-".join(parts) for parts in itertools.product(*part_options)]
+            # Parts are yoficated out of context ("хай-тек" is not "хай-тёк"),
+            # so the result is never certain.
+            if word not in options:
+                options.append(word)
+        return options or [word]
+
+    def _text_word_options(self, word: str) -> list[str] | None:
+        ys = self.yofications.get(word)
+        if ys is None:
+            word_lower = word.lower()
+            if word_lower == word:
+                return None
+            ys = self.yofications.get(word_lower)
+            if ys is None:
+                return None
+        options: list[str] = []
+        for y in ys:
+            option = _apply_yofication(word, y)
+            if option is not None and option not in options:
+                options.append(option)
+        return options or None
+
+
+class LayerLookup(NamedTuple):
+    layer: str
+    yofications: list[str]
+
 
-def _read_y2yo_kernel_file(path: Path) -> list[str]:
-    lines = [
-        line.strip()
-        for line in path.read_text(encoding="utf-8").splitlines()
-        if line.strip()
-    ]
-    yo_forms: list[str] = []
-    for line in lines:
-        line = REMOVE_COMMENT_REGEXP.sub("", line)
-        if line.startswith("_"):
+class LayeredYoficator:
+    """Looks words up in several yoficators in order of precedence.
+
+    A layer is either a `Yoficator` or a function that loads one. Layers are
+    loaded the first time a lookup misses all layers above them, so lookups
+    answered by cheap layers never load expensive ones.
+    """
+
+    def __init__(
+        self, layers: Sequence[tuple[str, Yoficator | Callable[[], Yoficator]]]
+    ):
+        self._names = [name for name, _ in layers]
+        self._sources = [source for _, source in layers]
+        self._yoficators: list[Yoficator] = []
+
+    # Reviewed yofication dictionary, then the e2yo kernel, then Wiktionary.
+    # `dictionary` replaces the dictionary loaded from YOFICATION_DICTIONARY_YAML.
+    @classmethod
+    def default(cls, dictionary: Yoficator | None = None) -> "LayeredYoficator":
+        return cls(
+            [
+                (
+                    "yofication_dictionary",
+                    dictionary
+                    if dictionary is not None
+                    else _load_yofication_dictionary,
+                ),
+                ("e2yo_kernel", lambda: Yoficator.from_e2yo_kernel(storage="snapshot")),
+                (
+                    "ru_wiktionary",
+                    lambda: Yoficator.from_ru_wiktionary(storage="snapshot"),
+                ),
+            ]
+        )
+
+    @property
+    def loaded_layers(self) -> list[str]:
+        return self._names[: len(self._yoficators)]
+
+    # Returns the first layer that knows the word, or None.
+    def lookup(self, word: str) -> LayerLookup | None:
+        assert is_relaxed_russian_word(word), f'"{word}" is not a Russian word'
+        key = word.lower()
+        for i, name in enumerate(self._names):
+            yofications = self._layer(i).yofications.get(key)
+            if yofications is not None:
+                return LayerLookup(name, yofications)
+        return None
+
+    def contains(self, word: str) -> bool:
+        return self.lookup(word) is not None
+
+    def __call__(self, word: str) -> list[str]:
+        result = self.lookup(word)
+        return result.yofications if result is not None else [word]
+
+    def _layer(self, index: int) -> Yoficator:
+        while len(self._yoficators) <= index:
+            source = self._sources[len(self._yoficators)]
+            self._yoficators.append(
+                source if isinstance(source, Yoficator) else source()
+            )
+        return self._yoficators[index]
+
+
+def _load_yofication_dictionary() -> Yoficator:
+    if not YOFICATION_DICTIONARY_YAML.exists():
+        return Yoficator(yofications={})
+    return Yoficator.from_yofication_dictionary(storage="snapshot")
+
+
+# Same output as `yaml.dump` with `FlowListDumper`. Simple lines are written
+# directly, the rest goes through PyYAML.
+def _write_yofication_dictionary_yaml(
+    yofications: dict[str, list[str]], output: TextIO
+):
+    if not yofications:
+        output.write(yaml.dump({}, allow_unicode=True, Dumper=FlowListDumper))
+    for k, vs in yofications.items():
+        line = f'"{k}": [{", ".join(f'"{v}"' for v in vs)}]'
+        if (
+            len(line) <= _YAML_LINE_WIDTH
+            and k
+            and all(map(_PLAIN_DOUBLE_QUOTED_REGEXP.fullmatch, [k, *vs]))
+        ):
+            output.write(f"{line}\n")
+        else:
+            output.write(yaml.dump({k: vs}, allow_unicode=True, Dumper=FlowListDumper))
+
+
+# Parses lines written without PyYAML directly, and falls back to PyYAML if
+# there are any others.
+def _read_yofication_dictionary_yaml(content: str) -> dict[str, list[str]]:
+    yofications: dict[str, list[str]] = {}
+    for line in content.splitlines():
+        match = _PLAIN_YOFICATION_LINE_REGEXP.fullmatch(line)
+        if match is None:
+            return TypeAdapter(dict[str, list[str]]).validate_python(
+                yaml.load(content, Loader=_LIBYAML_SAFE_LOADER)
+            )
+        k, values = match.groups()
+        yofications[k] = values[1:-1].split('", "') if values else []
+    return yofications
+
+
+# Puts "ё" of `yofication` into `word`, keeping the capitalization of `word`.
+# Returns None if `yofication` is not a spelling of `word`.
+def _apply_yofication(word: str, yofication: str) -> str | None:
+    if len(word) != len(yofication) or (
+        deyoficate(word).lower() != deyoficate(yofication).lower()
+    ):
+        return None
+    letters = list(word)
+    for i, ch in enumerate(yofication):
+        if ch == "ё" or ch == "Ё":
+            letters[i] = "Ё" if word[i].isupper() else "ё"
+    return "".join(letters)
+
+
+def _read_e2yo_kernel_patterns(path: Path) -> _KernelPatterns:
+    by_base: dict[str, list[_KernelPattern]] = {}
+    suffixes_by_text: dict[str, _KernelSuffixes] = {}
+    for line_number, line in enumerate(path.read_text(encoding="utf-8").splitlines()):
+        line = REMOVE_COMMENT_REGEXP.sub("", line.strip())
+        if not line or line.startswith("_"):
             continue
         multi_match = E2YO_MULTI_REGEXP.match(line)
-        if multi_match:
-            base = multi_match.group(1)
-            yo_forms.extend(
-                f"{base}{suffix}" for suffix in multi_match.group(2).split("|")
+        base, suffixes_text = multi_match.groups() if multi_match else (line, "")
+        suffixes = suffixes_by_text.get(suffixes_text)
+        if suffixes is None:
+            suffixes = suffixes_by_text[suffixes_text] = _make_kernel_suffixes(
+                suffixes_text
             )
-        else:
-            yo_forms.append(line)
-    return yo_forms
+        assert _is_russian_pattern(base, suffixes), f'"{line}" has non-Russian words'
+        by_base.setdefault(deyoficate(base), []).append((line_number, base, suffixes))
+    max_suffix_length = max(
+        (len(s) for suffixes in suffixes_by_text.values() for s in suffixes.positions),
+        default=0,
+    )
+    return _KernelPatterns(by_base, max_suffix_length)
+
+
+def _make_kernel_suffixes(suffixes_text: str) -> _KernelSuffixes:
+    suffixes = tuple(suffixes_text.split("|"))
+    positions: dict[str, list[int]] = {}
+    for i, suffix in enumerate(suffixes):
+        positions.setdefault(deyoficate(suffix), []).append(i)
+    return _KernelSuffixes(
+        suffixes,
+        positions,
+        russian_chars_and_ends=(
+            _RUSSIAN_WORD_CHARS_REGEXP.match("".join(suffixes)) is not None
+            and all(s[-1] in _RUSSIAN_LETTERS for s in suffixes if s)
+        ),
+        russian_starts=all(s[:1] in _RUSSIAN_LETTERS for s in suffixes),
+        has_empty="" in suffixes,
+    )
+
+
+# Same as checking `is_russian_word` for every `base + suffix`, without
+# building the words.
+def _is_russian_pattern(base: str, suffixes: _KernelSuffixes) -> bool:
+    if not suffixes.russian_chars_and_ends or not _RUSSIAN_WORD_CHARS_REGEXP.match(
+        base
+    ):
+        return False
+    starts_ok = base[0] in _RUSSIAN_LETTERS if base else suffixes.russian_starts
+    ends_ok = not suffixes.has_empty or base[-1:] in _RUSSIAN_LETTERS
+    return starts_ok and ends_ok
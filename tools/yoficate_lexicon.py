@@ -1,11 +1,14 @@
+import bisect
 import datetime
+import itertools
 from dataclasses import dataclass
 from pathlib import Path
 
 import typer
 
+from tools.utils.files import write_atomically
 from tools.utils.lexicon import lexicon_header_to_yaml, yaml_to_lexicon
-from tools.utils.yoficator import Yoficator
+from tools.utils.yoficator import AmbiguousSpan, Yoficator
 
 
 @dataclass
@@ -14,10 +17,30 @@ class Word:
     comment: str | None = None
 
 
-def yoficate_word(w: str, yoficate: Yoficator) -> list[Word]:
-    yofications = yoficate(w)
-    is_ambiguous = len(yofications) > 1
-    return [Word(word=y, comment="???" if is_ambiguous else None) for y in yofications]
+# Yoficates all words at once. A word with ambiguous spans is expanded into all
+# its variants, marked with "???".
+def yoficate_words(words: list[str], yoficator: Yoficator) -> list[Word]:
+    assert not any("\n" in w for w in words)
+    result = yoficator.yoficate_text("\n".join(words))
+    word_starts = list(itertools.accumulate((len(w) + 1 for w in words), initial=0))
+    spans_by_word: dict[int, list[AmbiguousSpan]] = {}
+    for span in result.ambiguous_spans:
+        i = bisect.bisect_right(word_starts, span.start) - 1
+        spans_by_word.setdefault(i, []).append(span)
+
+    yoficated_words: list[Word] = []
+    for i, w in enumerate(result.text.split("\n")):
+        spans = spans_by_word.get(i)
+        if not spans:
+            yoficated_words.append(Word(word=w))
+            continue
+        for options in itertools.product(*(span.options for span in spans)):
+            letters = list(w)
+            for span, option in zip(spans, options, strict=True):
+                start = span.start - word_starts[i]
+                letters[start : start + len(option)] = option
+            yoficated_words.append(Word(word="".join(letters), comment="???"))
+    return yoficated_words
 
 
 def word_to_yaml(w: Word) -> str:
@@ -25,20 +48,22 @@ def word_to_yaml(w: Word) -> str:
 
 
 def yoficate(lexicon_path: Path):
-    yoficate = Yoficator.from_e2yo_kernel()
+    yoficate = Yoficator.from_e2yo_kernel(storage="snapshot")
     lexicon = yaml_to_lexicon(lexicon_path.read_text(encoding="utf-8"))
     assert lexicon.language == "Russian"
     assert lexicon.kind == "standard"
-    words = [y for w in lexicon.words for y in yoficate_word(w, yoficate)]
+    words = yoficate_words(lexicon.words, yoficate)
 
     lexicon.updated_at = datetime.date.today()
-    new_lexicon_yaml = (
+    # Built in full before the source lexicon is replaced, so an error never
+    # leaves it half-written.
+    content = (
         lexicon_header_to_yaml(lexicon)
         + "---\n"
-        + "\n".join(word_to_yaml(w) for w in words)
-        + "\n"
+        + "".join(f"{word_to_yaml(w)}\n" for w in words)
     )
-    lexicon_path.write_text(new_lexicon_yaml, encoding="utf-8")
+    with write_atomically(lexicon_path) as f:
+        f.write(content)
 
 
 if __name__ == "__main__":